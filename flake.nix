@@ -66,6 +66,7 @@
 
                 requests
                 networkx
+                numpy
                 # matplotlib
                 bokeh
                 selenium # bokeh dependency for export
@@ -73,6 +74,9 @@
                 # maps and projections
                 pyproj
                 xyzservices
+
+                # tests
+                pytest
               ]);
 
             shellHook = "python -m ipykernel install --user";
@@ -0,0 +1,44 @@
+"""Measures maze generation and solving time against maze size."""
+
+import argparse
+import time
+from random import Random
+
+from generator import generate_maze, find_start_end
+from solver import solve
+
+SIZES = [(21, 31), (101, 101), (301, 301), (1001, 1001), (2001, 2001), (3001, 3001)]
+
+
+def benchmark(sizes, repeats: int = 3, seed: int = 0):
+    """Yields (rows, cols, best generation time, best solve time, expanded nodes) for every size."""
+    for rows, cols in sizes:
+        generation_timings = []
+        solve_timings = []
+        expanded = 0
+        for i in range(repeats):
+            rng = Random(seed + i)
+            start = time.perf_counter()
+            grid = generate_maze(rows, cols, rng)
+            start_pos, end_pos = find_start_end(grid, rng)
+            generation_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _, trace = solve(grid, start_pos, end_pos)
+            solve_timings.append(time.perf_counter() - start)
+            expanded = max(expanded, len(trace))
+
+        yield rows, cols, min(generation_timings), min(solve_timings), expanded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-cells', type=int, default=10_000_000, help="skip sizes with more cells than this")
+    args = parser.parse_args()
+
+    sizes = [(rows, cols) for rows, cols in SIZES if rows * cols <= args.max_cells]
+
+    print(f"{'size':>12} {'cells':>10} {'generate [s]':>13} {'cells/s':>12} {'solve [s]':>10} {'expanded':>10}")
+    for rows, cols, generation, solving, expanded in benchmark(sizes, args.repeats):
+        print(f"{f'{rows}x{cols}':>12} {rows * cols:>10} {generation:>13.3f} {rows * cols / generation:>12.0f} {solving:>10.3f} {expanded:>10}")
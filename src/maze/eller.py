@@ -0,0 +1,171 @@
+"""
+Row-streaming maze generation with Eller's algorithm.
+
+Only the current row is kept in memory, so mazes can be arbitrarily tall (or endless). Rows use the same cell
+values as generator.generate_maze, with cells on odd positions, walls between them and a wall border around.
+That's not the same layout: generate_maze carves from the middle cell, so depending on the size its outermost
+rows and columns can be open.
+"""
+
+import argparse
+import itertools
+import time
+from random import Random
+
+import numpy as np
+
+from generator import WALL, PATH
+from export import HEADER, RECORD, MAGIC, VERSION
+
+
+def eller_rows(width: int, height: int | None = None, rng: Random | None = None):
+    """
+    Yields grid rows (uint8 arrays of 2 * width + 1 cells) of a maze width cells wide.
+
+    With height set, the maze is 2 * height + 1 rows tall (borders included), otherwise rows never end.
+    """
+    rng = rng or Random()
+    cols = 2 * width + 1
+
+    yield np.zeros(cols, dtype=np.uint8)  # top border
+
+    sets = [0] * width  # set of every cell in the current row, 0 means no set yet
+    next_set = 1
+    row = 0
+
+    while height is None or row < height:
+        last = height is not None and row == height - 1
+
+        for i in range(width):
+            if not sets[i]:
+                sets[i] = next_set
+                next_set += 1
+
+        members = {}
+        for i, cell_set in enumerate(sets):
+            members.setdefault(cell_set, []).append(i)
+
+        # Join neighbours from different sets (all of them in the last row, so the maze stays connected)
+        cells = bytearray(cols)
+        cells[1::2] = bytes([PATH]) * width
+        for i in range(width - 1):
+            a, b = sets[i], sets[i + 1]
+            if a != b and (last or rng.random() < 0.5):
+                cells[2 * i + 2] = PATH
+
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                for j in members[b]:
+                    sets[j] = a
+                members[a].extend(members.pop(b))
+
+        yield np.frombuffer(cells, dtype=np.uint8)
+
+        if last:
+            break
+
+        # Every set has to continue down at least once
+        below = bytearray(cols)
+        next_sets = [0] * width
+        for cell_set, indexes in members.items():
+            down = [j for j in indexes if rng.random() < 0.5] or [indexes[rng.randrange(len(indexes))]]
+            for j in down:
+                below[2 * j + 1] = PATH
+                next_sets[j] = cell_set
+
+        yield np.frombuffer(below, dtype=np.uint8)
+
+        sets = next_sets
+        row += 1
+
+    yield np.zeros(cols, dtype=np.uint8)  # bottom border
+
+
+class RowWriter:
+    """
+    Writes rows straight into a single-maze file in the export.py format.
+
+    Row count is not known up front, so the header is patched when the writer is closed. Start is the top left
+    cell, end is the bottom right one.
+    """
+
+    def __init__(self, path: str, cols: int, seed: int = 0):
+        self.cols = cols
+        self.seed = seed
+        self.rows = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, cols, 1))
+        self._file.write(RECORD.pack(seed, 0, 0))
+
+    def write(self, row: np.ndarray):
+        self._file.write(np.packbits(row != WALL).tobytes())
+        self.rows += 1
+
+    def close(self):
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.rows, self.cols, 1))
+        self._file.write(RECORD.pack(self.seed, self.cols + 1, (self.rows - 2) * self.cols + self.cols - 2))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def show_rows(rows, cols: int, visible_rows: int = 201, rows_per_tick: int = 2):
+    """Scrolls endless rows through a MazeView, keeping only the visible window in memory."""
+    import sys
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    from mazeView import MazeView
+
+    app = QApplication(sys.argv)
+    view = MazeView(cell_size=8)
+    window = np.zeros((visible_rows, cols), dtype=np.uint8)
+    view.set_grid(window)
+    view.setWindowTitle('Labirynt Ellera')
+    view.show()
+
+    def tick():
+        new_rows = list(itertools.islice(rows, rows_per_tick))
+        if not new_rows:
+            timer.stop()
+            return
+
+        window[:-len(new_rows)] = window[len(new_rows):]
+        window[-len(new_rows):] = new_rows
+        view.set_grid(window, reset_view=False)
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(16)
+
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates a maze row by row using constant memory.")
+    parser.add_argument('output', nargs='?', help="output file (export.py format)")
+    parser.add_argument('--width', type=int, default=100, help="width in cells (grid is 2 * width + 1 wide)")
+    parser.add_argument('--height', type=int, default=None, help="height in cells, endless when not set (only with --show)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--show', action='store_true', help="scroll the maze in a window instead of saving it")
+    args = parser.parse_args()
+
+    cols = 2 * args.width + 1
+    rows = eller_rows(args.width, args.height, Random(args.seed))
+
+    if args.show:
+        show_rows(rows, cols)
+    elif args.output is None or args.height is None:
+        parser.error("saving to a file needs both output and --height")
+    else:
+        start = time.perf_counter()
+        with RowWriter(args.output, cols, args.seed) as writer:
+            for row in rows:
+                writer.write(row)
+
+        elapsed = time.perf_counter() - start
+        print(f"Saved {writer.rows} rows ({cols} cells each) to {args.output} in {elapsed:.2f} s ({writer.rows / elapsed:.0f} rows/s)")
@@ -0,0 +1,122 @@
+"""
+Headless bulk maze generation, written to a compact bit-packed binary file.
+
+File layout (little-endian):
+    header: b'MAZE', version (u8), 3 padding bytes, rows (u32), cols (u32), count (u32)
+    count records: seed (u64), start (u64), end (u64), rows * ceil(cols / 8) bytes of packed rows
+
+Start and end are flat cell indexes (row * cols + col). A set bit means an open cell.
+"""
+
+import argparse
+import struct
+import time
+from multiprocessing import Pool
+from random import Random
+
+import numpy as np
+
+from generator import WALL, PATH, START, END, generate_maze, find_start_end
+
+MAGIC = b'MAZE'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xIII')
+RECORD = struct.Struct('<QQQ')
+
+
+def pack_rows(grid: np.ndarray) -> bytes:
+    """Packs the grid into one bit per cell, every row padded to a whole byte."""
+    return np.packbits(grid != WALL, axis=1).tobytes()
+
+
+def unpack_rows(data: bytes, rows: int, cols: int) -> np.ndarray:
+    packed = np.frombuffer(data, dtype=np.uint8).reshape(rows, -1)
+    return np.unpackbits(packed, axis=1, count=cols).astype(np.uint8) * PATH
+
+
+class MazeWriter:
+    """Streams mazes into a file. Count in the header is filled in when the writer is closed."""
+
+    def __init__(self, path: str, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, rows, cols, 0))
+
+    def write(self, seed: int, packed: bytes, start: int, end: int):
+        self._file.write(RECORD.pack(seed, start, end))
+        self._file.write(packed)
+        self.count += 1
+
+    def close(self):
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.rows, self.cols, self.count))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_mazes(path: str):
+    """Yields (seed, grid, start_pos, end_pos) for every maze in the file, reading one maze at a time."""
+    with open(path, 'rb') as f:
+        magic, version, rows, cols, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a maze file (version {VERSION})")
+
+        maze_size = rows * ((cols + 7) // 8)
+        for _ in range(count):
+            seed, start, end = RECORD.unpack(f.read(RECORD.size))
+            grid = unpack_rows(f.read(maze_size), rows, cols)
+
+            start_pos = divmod(start, cols)
+            end_pos = divmod(end, cols)
+            grid[start_pos] = START
+            grid[end_pos] = END
+
+            yield seed, grid, start_pos, end_pos
+
+
+def _generate(task):
+    rows, cols, seed = task
+    rng = Random(seed)
+    grid = generate_maze(rows, cols, rng)
+    (start_row, start_col), (end_row, end_col) = find_start_end(grid, rng)
+
+    # Pakujemy już w procesie roboczym, żeby nie przesyłać całych gridów między procesami
+    return seed, pack_rows(grid), start_row * cols + start_col, end_row * cols + end_col
+
+
+def generate_mazes(count: int, rows: int, cols: int, seed: int = 0, workers: int | None = None):
+    """Yields (seed, packed rows, start, end) for count mazes with consecutive seeds, generated on a process pool."""
+    tasks = ((rows, cols, seed + i) for i in range(count))
+
+    if workers == 1:
+        yield from map(_generate, tasks)
+        return
+
+    with Pool(workers) as pool:
+        yield from pool.imap(_generate, tasks, chunksize=max(1, min(64, 1_000_000 // (rows * cols))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates mazes without a display and saves them to a bit-packed file.")
+    parser.add_argument('output', help="output file")
+    parser.add_argument('-n', '--count', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=21)
+    parser.add_argument('--cols', type=int, default=31)
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first maze, the following ones get seed + 1, seed + 2, ...")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (defaults to the number of CPUs)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with MazeWriter(args.output, args.rows, args.cols) as writer:
+        for seed, packed, start_idx, end_idx in generate_mazes(args.count, args.rows, args.cols, args.seed, args.workers):
+            writer.write(seed, packed, start_idx, end_idx)
+
+    elapsed = time.perf_counter() - start
+    print(f"Saved {writer.count} mazes ({args.rows}x{args.cols}) to {args.output} in {elapsed:.2f} s ({writer.count / elapsed:.1f} mazes/s)")
@@ -0,0 +1,91 @@
+"""Maze generation without any GUI, on a flat NumPy grid."""
+
+from random import Random
+
+import numpy as np
+
+# Cell values in the grid
+WALL = 0
+PATH = 1
+START = 2
+END = 3
+
+# Solver state, used only for drawing
+VISITED = 4
+FRONTIER = 5
+SOLUTION = 6
+
+# Random tries in find_start_end before falling back to listing all open cells
+_MAX_SAMPLES = 1000
+
+
+def generate_maze(rows: int, cols: int, rng: Random | None = None) -> np.ndarray:
+    """
+    Generates a maze with randomized depth-first search (recursive backtracker).
+
+    Uses an explicit stack instead of recursion, so size is limited only by memory. Returns a (rows, cols)
+    uint8 array of WALL and PATH cells, carved from the middle of the grid in steps of two cells.
+    """
+    rng = rng or Random()
+
+    # Carving is done on a flat bytearray, it's much faster than indexing a numpy array cell by cell
+    cells = bytearray(rows * cols)
+    start = (rows // 2) * cols + cols // 2
+    cells[start] = PATH
+
+    stack = [start]
+    while stack:
+        current = stack[-1]
+        row, col = divmod(current, cols)
+
+        # Unvisited neighbours two cells away (up, down, left, right)
+        directions = []
+        if row >= 2 and not cells[current - 2 * cols]:
+            directions.append(-cols)
+        if row + 2 < rows and not cells[current + 2 * cols]:
+            directions.append(cols)
+        if col >= 2 and not cells[current - 2]:
+            directions.append(-1)
+        if col + 2 < cols and not cells[current + 2]:
+            directions.append(1)
+
+        if not directions:
+            stack.pop()
+            continue
+
+        step = directions[rng.randrange(len(directions))] if len(directions) > 1 else directions[0]
+        cells[current + step] = PATH
+        cells[current + 2 * step] = PATH
+        stack.append(current + 2 * step)
+
+    return np.frombuffer(cells, dtype=np.uint8).reshape(rows, cols)
+
+
+def find_start_end(grid: np.ndarray, rng: Random | None = None) -> tuple[tuple[int, int], tuple[int, int]]:
+    """
+    Picks two different random open cells as (start, end) positions.
+
+    Random cells are tried until they land on open ones (about half of a maze is open), so no list of open
+    cells is built. Only mostly closed grids fall back to listing them.
+    """
+    rng = rng or Random()
+    rows, cols = grid.shape
+
+    cells = []
+    for _ in range(_MAX_SAMPLES):
+        cell = divmod(rng.randrange(rows * cols), cols)
+        if grid[cell] == PATH and cell not in cells:
+            cells.append(cell)
+            if len(cells) == 2:
+                return cells[0], cells[1]
+
+    open_cells = np.flatnonzero(grid == PATH)
+    if len(open_cells) < 2:
+        raise ValueError("Maze needs at least two open cells")
+
+    start = rng.randrange(len(open_cells))
+    end = rng.randrange(len(open_cells) - 1)
+    if end >= start:
+        end += 1
+
+    return divmod(int(open_cells[start]), cols), divmod(int(open_cells[end]), cols)
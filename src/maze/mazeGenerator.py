@@ -1,19 +1,16 @@
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtWidgets import QApplication, QWidget, QGridLayout, QLabel, QSizePolicy, QPushButton, QVBoxLayout
-from random import choice
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout
+from random import Random
 import sys
 
-CELL_SIZE = 35
+import numpy as np
 
+from generator import PATH, START, END, VISITED, FRONTIER, SOLUTION, generate_maze, find_start_end
+from mazeView import MazeView
+from solver import solve
 
-class Cell:
-    def __init__(self, row: int, col: int):
-        self.row = row
-        self.col = col
-        self.visited = False
-        self.is_wall = True
-        self.is_start = False
-        self.is_end = False
+CELL_SIZE = 35
+ANIMATION_FRAMES = 300  # Na tyle klatek dzielimy animację rozwiązywania
 
 
 class MazeGenerator(QWidget):
@@ -21,82 +18,50 @@ class MazeGenerator(QWidget):
         super().__init__()
         self.rows = rows
         self.cols = cols
-        self.grid = []
-        self.cell_widgets = {}
+        self.grid = None
+        self.rng = Random()
         self.start_pos = None
         self.end_pos = None
+        self.solution = None
+        self.trace = None
+        self.animation_step = 0
+        self.animation_timer = QTimer(self)
+        self.animation_timer.timeout.connect(self.animate_solution)
         self.initUI()
 
     def initUI(self):
         main_layout = QVBoxLayout()
         self.setLayout(main_layout)
 
-        self.maze_layout = QGridLayout()
-        self.maze_layout.setSpacing(0)
-        main_layout.addLayout(self.maze_layout)
+        self.maze_view = MazeView(CELL_SIZE)
+        main_layout.addWidget(self.maze_view)
 
         generate_button = QPushButton("Generuj nowy labirynt")
         generate_button.clicked.connect(self.generate_maze)
         main_layout.addWidget(generate_button)
 
-        self.initialize_grid()
+        solve_button = QPushButton("Rozwiąż labirynt")
+        solve_button.clicked.connect(self.solve_maze)
+        main_layout.addWidget(solve_button)
 
         self.setWindowTitle('Generator Labiryntów')
         self.show()
 
         self.generate_maze()
 
-    def initialize_grid(self):
-        self.grid = [[Cell(row, col) for col in range(self.cols)] for row in range(self.rows)]
-
-        for row in range(self.rows):
-            for col in range(self.cols):
-                label = QLabel()
-                label.setStyleSheet("background-color: #2c3e50; border: 1px solid #34495e;")
-                label.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-                label.setFixedSize(QSize(CELL_SIZE, CELL_SIZE))
-                self.maze_layout.addWidget(label, row, col)
-                self.cell_widgets[(row, col)] = label
-
     def find_valid_start_end_positions(self):
-        # Lista wszystkich dostępnych pozycji (nie-ścian)
-        available_positions = []
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if not self.grid[row][col].is_wall:
-                    available_positions.append((row, col))
-
-        # Wybierz losową pozycję startową i końcową
-        self.start_pos = choice(available_positions)
-        # Usuń pozycję startową z dostępnych pozycji
-        available_positions.remove(self.start_pos)
-        # Wybierz pozycję końcową z pozostałych pozycji
-        self.end_pos = choice(available_positions)
-
-        # Ustaw flagi w komórkach
-        start_row, start_col = self.start_pos
-        end_row, end_col = self.end_pos
-        self.grid[start_row][start_col].is_start = True
-        self.grid[end_row][end_col].is_end = True
+        # Wybierz losową pozycję startową i końcową spośród nie-ścian
+        self.start_pos, self.end_pos = find_start_end(self.grid, self.rng)
+
+        # Oznacz je w gridzie
+        self.grid[self.start_pos] = START
+        self.grid[self.end_pos] = END
 
     def generate_maze(self):
-        # Reset gridu
-        for row in self.grid:
-            for cell in row:
-                cell.visited = False
-                cell.is_wall = True
-                cell.is_start = False
-                cell.is_end = False
-
-        # Reset kolorów
-        for label in self.cell_widgets.values():
-            label.setStyleSheet("background-color: #2c3e50; border: 1px solid #34495e;")
-
-        # Rozpocznij od środka
-        start_row = self.rows // 2
-        start_col = self.cols // 2
-        self.grid[start_row][start_col].is_wall = False
-        self.dfs(start_row, start_col)
+        self.animation_timer.stop()
+
+        # Nowy grid, generowany iteracyjnie od środka
+        self.grid = generate_maze(self.rows, self.cols, self.rng)
 
         # Znajdź i ustaw punkty startowy i końcowy
         self.find_valid_start_end_positions()
@@ -104,40 +69,45 @@ class MazeGenerator(QWidget):
         # Aktualizuj widok
         self.update_maze_view()
 
-    def dfs(self, row: int, col: int):
-        self.grid[row][col].visited = True
-        self.grid[row][col].is_wall = False
-
-        # Lista możliwych kierunków (góra, prawo, dół, lewo)
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-
-        while directions:
-            dx, dy = choice(directions)
-            directions.remove((dx, dy))
-
-            new_row = row + (dx * 2)
-            new_col = col + (dy * 2)
-
-            if (0 <= new_row < self.rows and
-                    0 <= new_col < self.cols and
-                    not self.grid[new_row][new_col].visited):
-                self.grid[row + dx][col + dy].is_wall = False
-                self.dfs(new_row, new_col)
-
     def update_maze_view(self):
-        for row in range(self.rows):
-            for col in range(self.cols):
-                cell = self.grid[row][col]
-                label = self.cell_widgets[(row, col)]
-
-                if cell.is_start:
-                    label.setStyleSheet("background-color: #2ecc71; border: 1px solid #34495e;")  # Zielony
-                elif cell.is_end:
-                    label.setStyleSheet("background-color: #e74c3c; border: 1px solid #34495e;")  # Czerwony
-                elif cell.is_wall:
-                    label.setStyleSheet("background-color: #2c3e50; border: 1px solid #34495e;")  # Ciemnoniebieski
-                else:
-                    label.setStyleSheet("background-color: white; border: 1px solid #34495e;")
+        # Cały labirynt rysowany jest jako jeden obraz
+        self.maze_view.set_grid(self.grid)
+
+    def solve_maze(self):
+        # Wyczyść poprzednie rozwiązanie
+        self.grid[self.grid >= VISITED] = PATH
+        self.maze_view.set_grid(self.grid, reset_view=False)
+
+        self.solution, self.trace = solve(self.grid, self.start_pos, self.end_pos)
+        self.animation_step = 0
+        self.animation_timer.start(16)
+
+    def animate_solution(self):
+        cols = self.cols
+        steps_per_frame = max(1, len(self.trace) // ANIMATION_FRAMES)
+        last_step = min(self.animation_step + steps_per_frame, len(self.trace))
+
+        # Odwiedzone i otwarte komórki z kolejnych kroków A*
+        expanded = np.asarray(self.trace.expanded[self.animation_step:last_step], dtype=np.int64)
+        opened = np.asarray(self.trace.opened[self.trace.offsets[self.animation_step]:self.trace.offsets[last_step]], dtype=np.int64)
+        self.animation_step = last_step
+
+        flat_grid = self.grid.reshape(-1)
+        opened = opened[flat_grid[opened] == PATH]
+        flat_grid[opened] = FRONTIER
+        expanded = expanded[(flat_grid[expanded] == PATH) | (flat_grid[expanded] == FRONTIER)]
+        flat_grid[expanded] = VISITED
+        changed = np.concatenate([opened, expanded])
+
+        if self.animation_step >= len(self.trace):
+            self.animation_timer.stop()
+
+            # Na koniec pokaż znalezioną ścieżkę
+            path = np.array([row * cols + col for row, col in self.solution[1:-1]], dtype=np.int64)
+            flat_grid[path] = SOLUTION
+            changed = np.concatenate([changed, path])
+
+        self.maze_view.update_cells(changed // cols, changed % cols)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,165 @@
+import numpy as np
+from PyQt6.QtCore import Qt, QPointF, QRect, QRectF, QSize
+from PyQt6.QtGui import QColor, QImage, QPainter, QPen
+from PyQt6.QtWidgets import QWidget
+
+from generator import WALL, PATH, START, END, VISITED, FRONTIER, SOLUTION
+
+# Kolory komórek jako 0xAARRGGBB, indeksowane wartością z gridu
+PALETTE = np.zeros(256, dtype=np.uint32)
+PALETTE[WALL] = 0xff2c3e50  # Ciemnoniebieski
+PALETTE[PATH] = 0xffffffff  # Biały
+PALETTE[START] = 0xff2ecc71  # Zielony
+PALETTE[END] = 0xffe74c3c  # Czerwony
+PALETTE[VISITED] = 0xffd3d3d3  # Jasnoszary
+PALETTE[FRONTIER] = 0xff27ae60  # Ciemnozielony
+PALETTE[SOLUTION] = 0xfff39c12  # Pomarańczowy
+
+BORDER_COLOR = QColor("#34495e")
+MIN_BORDER_ZOOM = 8  # Ramki komórek rysujemy dopiero przy takim powiększeniu
+MIN_ZOOM = 0.05
+MAX_ZOOM = 200
+
+
+class MazeView(QWidget):
+    """
+    Draws the whole maze from the grid array as a single image (one pixel per cell), scaled without smoothing.
+
+    Changed cells are written straight into the image buffer and only their area is repainted.
+    Mouse wheel zooms around the cursor, dragging pans the view.
+    """
+
+    def __init__(self, cell_size: int = 35, parent=None):
+        super().__init__(parent)
+        self.cell_size = cell_size
+        self.grid = None
+        self._pixels = None
+        self._image = None
+        self.zoom = float(cell_size)
+        self.offset = QPointF(0, 0)
+        self._drag_pos = None
+
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def sizeHint(self):
+        if self.grid is None:
+            return QSize(400, 400)
+
+        rows, cols = self.grid.shape
+        return QSize(min(cols * self.cell_size, 1200), min(rows * self.cell_size, 900))
+
+    def set_grid(self, grid: np.ndarray, reset_view: bool = True):
+        self.grid = grid
+        rows, cols = grid.shape
+
+        # QImage nie kopiuje danych, więc bufor musi żyć razem z obrazem
+        self._pixels = np.ascontiguousarray(PALETTE[grid])
+        self._image = QImage(self._pixels.data, cols, rows, cols * 4, QImage.Format.Format_RGB32)
+
+        if reset_view:
+            self.fit_to_view()
+        self.update()
+
+    def update_cells(self, rows, cols):
+        """Re-reads given cells from the grid and repaints only the area they cover."""
+        if self._image is None:
+            return
+
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        if rows.size == 0:
+            return
+
+        self._pixels[rows, cols] = PALETTE[self.grid[rows, cols]]
+
+        top, bottom = int(rows.min()), int(rows.max())
+        left, right = int(cols.min()), int(cols.max())
+        self.update(self._to_widget(QRectF(left, top, right - left + 1, bottom - top + 1)))
+
+    def fit_to_view(self):
+        if self.grid is None or self.width() == 0 or self.height() == 0:
+            return
+
+        rows, cols = self.grid.shape
+        self.zoom = min(self.width() / cols, self.height() / rows, float(self.cell_size))
+        self.offset = QPointF((self.width() - cols * self.zoom) / 2, (self.height() - rows * self.zoom) / 2)
+        self.update()
+
+    def _to_widget(self, rect: QRectF) -> QRect:
+        return QRectF(
+            self.offset.x() + rect.x() * self.zoom,
+            self.offset.y() + rect.y() * self.zoom,
+            rect.width() * self.zoom,
+            rect.height() * self.zoom
+        ).toAlignedRect()
+
+    def _visible_cells(self, rect: QRect) -> tuple[int, int, int, int]:
+        rows, cols = self.grid.shape
+        left = max(int((rect.left() - self.offset.x()) / self.zoom), 0)
+        top = max(int((rect.top() - self.offset.y()) / self.zoom), 0)
+        right = min(int((rect.right() + 1 - self.offset.x()) / self.zoom) + 1, cols)
+        bottom = min(int((rect.bottom() + 1 - self.offset.y()) / self.zoom) + 1, rows)
+        return left, top, right, bottom
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.palette().window())
+
+        if self._image is None:
+            return
+
+        # Rysujemy tylko fragment obrazu pokrywający odświeżany obszar
+        left, top, right, bottom = self._visible_cells(event.rect())
+        if left >= right or top >= bottom:
+            return
+
+        source = QRectF(left, top, right - left, bottom - top)
+        target = QRectF(
+            self.offset.x() + left * self.zoom,
+            self.offset.y() + top * self.zoom,
+            (right - left) * self.zoom,
+            (bottom - top) * self.zoom
+        )
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+        painter.drawImage(target, self._image, source)
+
+        if self.zoom >= MIN_BORDER_ZOOM:
+            painter.setPen(QPen(BORDER_COLOR, 1))
+            for col in range(left, right + 1):
+                x = self.offset.x() + col * self.zoom
+                painter.drawLine(QPointF(x, target.top()), QPointF(x, target.bottom()))
+            for row in range(top, bottom + 1):
+                y = self.offset.y() + row * self.zoom
+                painter.drawLine(QPointF(target.left(), y), QPointF(target.right(), y))
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        new_zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+
+        # Powiększamy względem kursora
+        cursor = event.position()
+        self.offset = cursor - (cursor - self.offset) * (new_zoom / self.zoom)
+        self.zoom = new_zoom
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_pos = event.position()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_pos is not None:
+            self.offset += event.position() - self._drag_pos
+            self._drag_pos = event.position()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_view()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if event.oldSize().isEmpty() or event.oldSize().width() <= 0:
+            self.fit_to_view()
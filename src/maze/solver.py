@@ -0,0 +1,90 @@
+"""Solves mazes with the A* engine from warsaw-demo, on an implicit graph computed from the grid."""
+
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+from generator import WALL
+
+# a_star lives next to the Warsaw demo, which isn't a package
+_WARSAW_DEMO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'warsaw-demo')
+
+
+def _load_warsaw_module(name: str):
+    """Loads a single module from warsaw-demo by path, without putting the whole directory on sys.path."""
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(_WARSAW_DEMO, f'{name}.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+
+    return sys.modules[name]
+
+
+_load_warsaw_module('instrumentation')  # imported by a_star
+a_star = _load_warsaw_module('a_star')
+
+
+class GridGraph:
+    """
+    Maze grid seen as a graph without building one: nodes are flat cell indexes (row * cols + col)
+    and neighbours are open cells next to them, looked up straight in the grid.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        self.rows, self.cols = grid.shape
+        self._open = (grid != WALL).tobytes()
+
+    def node(self, pos: tuple[int, int]) -> int:
+        return pos[0] * self.cols + pos[1]
+
+    def position(self, node: int) -> tuple[int, int]:
+        return divmod(node, self.cols)
+
+    def neighbors(self, node: int) -> list[int]:
+        cols = self.cols
+        is_open = self._open
+        col = node % cols
+
+        result = []
+        if node >= cols and is_open[node - cols]:
+            result.append(node - cols)
+        if node + cols < len(is_open) and is_open[node + cols]:
+            result.append(node + cols)
+        if col > 0 and is_open[node - 1]:
+            result.append(node - 1)
+        if col + 1 < cols and is_open[node + 1]:
+            result.append(node + 1)
+
+        return result
+
+    def manhattan(self, goal: int):
+        """Returns a Manhattan distance heuristic towards goal."""
+        goal_row, goal_col = divmod(goal, self.cols)
+        cols = self.cols
+
+        def heuristic(node):
+            row, col = divmod(node, cols)
+            return abs(row - goal_row) + abs(col - goal_col)
+
+        return heuristic
+
+
+def solve(grid: np.ndarray, start: tuple[int, int], end: tuple[int, int]):
+    """
+    Finds the shortest path from start to end.
+
+    Returns (path, trace) where path is a list of (row, col) positions (empty if there's no path)
+    and trace is an a_star.Trace of flat cell indexes, which can be used to animate the search.
+    """
+    graph = GridGraph(grid)
+    start_node = graph.node(start)
+    end_node = graph.node(end)
+
+    trace = a_star.Trace('q')
+    came_from = a_star.search(start_node, end_node, graph.neighbors, graph.manhattan(end_node), trace)
+
+    node_path = a_star.reconstruct_path_to_current(came_from, start_node, end_node)
+    return [graph.position(node) for node in node_path], trace
@@ -1,9 +1,12 @@
 """A (very small) collection of tools for working with A* algorithm."""
 
 import math
+from array import array
+from heapq import heappush, heappop
 
-import networkx as nx
+import instrumentation
 
+@instrumentation.timed('a_star.data')
 def data(G, algorithm_steps, mercator_positions):
 	"""Prepares data for visualization from A* algorithm steps."""
 
@@ -67,19 +70,103 @@ def reconstruct_path_to_current(came_from, start_stop_id, current_node):
 	path.reverse()
 	return path
 
-def steps(G, start_stop_id, end_stop_id):
-	"""Performs A* search algorithm and records the state at each step."""
+class Trace:
+	"""
+	Compact record of an A* run: nodes in the order they were expanded and nodes opened by each of them.
+
+	Opened nodes are stored in one flat list, offsets[i]:offsets[i + 1] being the ones opened by the i-th step.
+	With typecode set (e.g. 'q' for integer nodes), nodes are kept in arrays instead of lists.
+	"""
+
+	def __init__(self, typecode=None):
+		self.expanded = array(typecode) if typecode else []
+		self.opened = array(typecode) if typecode else []
+		self.offsets = array('q', [0])
+
+	def __len__(self):
+		return len(self.expanded)
+
+	def opened_by(self, step_idx):
+		return self.opened[self.offsets[step_idx]:self.offsets[step_idx + 1]]
+
+@instrumentation.timed('a_star.search')
+def search(start, goal, neighbors, heuristic, trace=None):
+	"""
+	Heap-based A* search with unit edge costs.
+
+	neighbors(node) returns adjacent nodes and heuristic(node) estimates the distance to goal, so any graph-like
+	structure can be searched. Expanded and opened nodes are recorded into trace (if given). Returns came_from.
+	"""
+
+	g_score = {start: 0}
+	came_from = {}
+	counter = 0		# breaks remaining ties in insertion order
+	heap = [(heuristic(start), 0, counter, start)]
+	pops = expansions = 0		# counted locally, reported to instrumentation once at the end
+
+	while heap:
+		_, negative_g, _, current = heappop(heap)
+		pops += 1
+
+		if -negative_g != g_score[current]:
+			continue		# outdated entry, node was reopened with a better score
+
+		if current == goal:
+			break
+
+		expansions += 1
+
+		if trace is not None:
+			trace.expanded.append(current)
+
+		temp_g_score = -negative_g + 1
+		for neighbor in neighbors(current):
+			if temp_g_score < g_score.get(neighbor, float('inf')):
+				came_from[neighbor] = current
+				g_score[neighbor] = temp_g_score
+
+				# ties on f_score go to the deeper node, it's closer to the goal
+				counter += 1
+				heappush(heap, (temp_g_score + heuristic(neighbor), -temp_g_score, counter, neighbor))
 
-	pos = nx.get_node_attributes(G, 'pos')
+				if trace is not None:
+					trace.opened.append(neighbor)
+
+		if trace is not None:
+			trace.offsets.append(len(trace.opened))
+
+	if instrumentation.enabled:
+		instrumentation.count('a_star.heap_pushes', counter + 1)
+		instrumentation.count('a_star.heap_pops', pops)
+		instrumentation.count('a_star.expansions', expansions)
+
+	return came_from
+
+def _distance_heuristic(G, end_stop_id):
+	pos = dict(G.nodes(data='pos'))
+	x2, y2 = pos[end_stop_id]
 
 	def heuristic(node):
 		x1, y1 = pos[node]
-		x2, y2 = pos[end_stop_id]
 
 		return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
+	return heuristic
+
+def graph_search(G, start_stop_id, end_stop_id):
+	"""Performs A* search algorithm on G. Returns (trace, came_from), see replay() for turning trace into steps."""
+
+	trace = Trace()
+	came_from = search(start_stop_id, end_stop_id, G.neighbors, _distance_heuristic(G, end_stop_id), trace)
+
+	return trace, came_from
+
+def replay(G, start_stop_id, end_stop_id, trace):
+	"""Replays a trace of graph_search() into full snapshots of the algorithm state at each step."""
+
+	heuristic = _distance_heuristic(G, end_stop_id)
+
 	open_set = {start_stop_id}
-	came_from = {}
 	g_score = {node: float('inf') for node in G.nodes()}
 	g_score[start_stop_id] = 0
 	f_score = {node: float('inf') for node in G.nodes()}
@@ -87,20 +174,15 @@ def steps(G, start_stop_id, end_stop_id):
 
 	algorithm_steps = []
 	visited = {}  # Keep track of visited nodes and their frame numbers
-	step_idx = 0 # Step index for assigning frame number
 	all_paths = [] # keep track of all paths
+	step_came_from = {}
 
-	while open_set:
-		current = min(open_set, key=lambda node: f_score[node])
-
-		if current == end_stop_id:
-			break
-
+	for step_idx, current in enumerate(trace.expanded):
 		open_set.remove(current)
 
 		# Store visited node with the current step index
 		visited[current] = step_idx
-		path_to_current = reconstruct_path_to_current(came_from, start_stop_id, current)
+		path_to_current = reconstruct_path_to_current(step_came_from, start_stop_id, current)
 
 		all_paths.append({
 			'path': path_to_current,
@@ -113,19 +195,21 @@ def steps(G, start_stop_id, end_stop_id):
 			'open_set': open_set.copy(),
 			'f_score': f_score.copy(),
 			'visited': visited.copy(), # Important: copy the dictionary
-            'all_paths': all_paths.copy()
+			'all_paths': all_paths.copy()
 		})
 
-		for neighbor in G.neighbors(current):
-			temp_g_score = g_score[current] + 1
+		for neighbor in trace.opened_by(step_idx):
+			step_came_from[neighbor] = current
+			g_score[neighbor] = g_score[current] + 1
+			f_score[neighbor] = g_score[neighbor] + heuristic(neighbor)
+			open_set.add(neighbor)
 
-			if temp_g_score < g_score[neighbor]:
-				came_from[neighbor] = current
-				g_score[neighbor] = temp_g_score
-				f_score[neighbor] = temp_g_score + heuristic(neighbor)
-				if neighbor not in open_set:
-					open_set.add(neighbor)
+	return algorithm_steps
+
+@instrumentation.timed('a_star.steps')
+def steps(G, start_stop_id, end_stop_id):
+	"""Performs A* search algorithm and records the state at each step."""
 
-		step_idx += 1
+	trace, came_from = graph_search(G, start_stop_id, end_stop_id)
 
-	return algorithm_steps, came_from
+	return replay(G, start_stop_id, end_stop_id, trace), came_from
@@ -0,0 +1,300 @@
+"""
+Benchmarks the routing and rendering pipeline on synthetic transit networks (or a recorded ZTM fixture), offline.
+
+Timings are measured with instrumentation turned off, then one more instrumented pass over every network collects
+counters (A* expansions, heap operations, frames rendered) and memory peaks. Results are saved as JSON.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import a_star
+import instrumentation
+from visualization import create_graph, create_stop_lookup, route_stop_ids, prepare_visualization_data, create_bokeh_plot, draw_edges, draw_nodes
+
+SIZES = [250, 1000, 2500]
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ztm_small.json')
+START_STOP_ID, END_STOP_ID = "('1238', '01')", "('1542', '01')"
+
+# roughly the area covered by ZTM
+_LATITUDE = (52.10, 52.35)
+_LONGITUDE = (20.85, 21.25)
+
+def _stop_values(zespol, slupek, latitude, longitude):
+	"""Single stop in the format of ZTM's dbstore_get API."""
+
+	return {'values': [
+		{'value': zespol, 'key': 'zespol'},
+		{'value': slupek, 'key': 'slupek'},
+		{'value': f"Przystanek {zespol}", 'key': 'nazwa_zespolu'},
+		{'value': '0', 'key': 'id_ulicy'},
+		{'value': f"{latitude:.6f}", 'key': 'szer_geo'},
+		{'value': f"{longitude:.6f}", 'key': 'dlug_geo'},
+		{'value': 'benchmark', 'key': 'kierunek'},
+		{'value': '2024-01-01 00:00:00.0', 'key': 'obowiazuje_od'},
+	]}
+
+def synthetic_network(n_stops, n_lines=None, seed=0):
+	"""
+	Returns (stops_data, routes_data) shaped like ZTM API responses.
+
+	Stops are scattered over a jittered grid and every line walks between neighbouring stops (both directions),
+	so the graph looks like a street network rather than a random one.
+	"""
+
+	rng = random.Random(seed)
+	n_lines = n_lines or max(1, n_stops // 8)
+
+	columns = math.ceil(math.sqrt(n_stops))
+	rows = math.ceil(n_stops / columns)
+
+	stops = []
+	grid = {}		# (row, column) -> (zespol, slupek)
+	for i in range(n_stops):
+		row, column = divmod(i, columns)
+		latitude = _LATITUDE[0] + (row + rng.uniform(-0.3, 0.3)) * (_LATITUDE[1] - _LATITUDE[0]) / rows
+		longitude = _LONGITUDE[0] + (column + rng.uniform(-0.3, 0.3)) * (_LONGITUDE[1] - _LONGITUDE[0]) / columns
+
+		stop_id = (str(1000 + i), '01')
+		stops.append(_stop_values(*stop_id, latitude, longitude))
+		grid[(row, column)] = stop_id
+
+	routes = {}
+	for line in range(n_lines):
+		cell = rng.choice(list(grid))
+		walk = [cell]
+		for _ in range(rng.randint(8, 30)):
+			row, column = walk[-1]
+			options = [
+				neighbor for neighbor in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1))
+				if neighbor in grid and neighbor not in walk
+			]
+			if not options:
+				break
+			walk.append(rng.choice(options))
+
+		stop_ids = [grid[cell] for cell in walk]
+		routes[str(100 + line)] = {
+			direction: {
+				str(i + 1): {'nr_zespolu': zespol, 'nr_przystanku': slupek, 'typ': '1'}
+				for i, (zespol, slupek) in enumerate(ordered)
+			}
+			for direction, ordered in (('TP-A', stop_ids), ('TP-B', stop_ids[::-1]))
+		}
+
+	return {'result': stops}, {'result': routes}
+
+def load_fixture(path):
+	"""Loads recorded stops and routes, e.g. a copy of api_cache.json."""
+
+	with open(path) as f:
+		data = json.load(f)
+
+	return data['stops_data'], data['routes_data']
+
+def trim_fixture(stops_data, routes_data, start, end, max_lines=8):
+	"""
+	Cuts recorded stops and routes down to a handful of lines around start and end (stop ids as used in graphs).
+
+	Keeps lines going through start or end and, when those don't share a stop, lines connecting them,
+	then only the stops these lines use. Returns (stops_data, routes_data) in the same format.
+	"""
+
+	stop_lookup = create_stop_lookup(stops_data)
+	line_stops = {
+		line: {str(stop_id) for route in directions.values() for stop_id in route_stop_ids(route, stop_lookup)}
+		for line, directions in routes_data['result'].items()
+	}
+
+	near_start = [line for line, stops in line_stops.items() if start in stops][:max_lines // 2]
+	near_end = [line for line, stops in line_stops.items() if end in stops][:max_lines // 2]
+	lines = list(dict.fromkeys(near_start + near_end))
+
+	start_stops = set().union(*(line_stops[line] for line in near_start))
+	end_stops = set().union(*(line_stops[line] for line in near_end))
+	if not start_stops & end_stops:
+		connecting = [
+			line for line, stops in line_stops.items()
+			if line not in lines and stops & start_stops and stops & end_stops
+		]
+		lines += connecting[:max(1, max_lines - len(lines))]
+
+	kept_stops = set().union(*(line_stops[line] for line in lines))
+	stops = []
+	for stop in stops_data['result']:
+		values = {item['key']: item['value'] for item in stop['values']}
+		if str((values['zespol'], values['slupek'])) in kept_stops:
+			stops.append(stop)
+
+	return {'result': stops}, {'result': {line: routes_data['result'][line] for line in lines}}
+
+def endpoints(G):
+	"""Picks two far apart stops (south-west and north-east corner) of the largest connected part of G."""
+	import networkx as nx
+
+	component = max(nx.connected_components(G), key=len)
+
+	def corner(node):
+		longitude, latitude = G.nodes[node]['pos']
+		return longitude + latitude
+
+	return min(component, key=corner), max(component, key=corner)
+
+def _measure(function, repeat):
+	"""Runs function repeat times, returns (timings in seconds, last result)."""
+
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = function()
+		timings.append(time.perf_counter() - start)
+
+	return timings, result
+
+def _summary(timings):
+	return {
+		'min': min(timings),
+		'median': statistics.median(timings),
+		'max': max(timings),
+		'runs': len(timings),
+	}
+
+def _frames(G, algorithm_steps, algorithm_data_sources, frames, export=False):
+	"""Draws (and exports, if set) the first frames of the animation. Returns per-frame timings in seconds."""
+	from frame_generator import draw_frame
+
+	node_data, edge_data, mercator_positions, min_x, max_x, min_y, max_y, _ = prepare_visualization_data(G)
+	map = create_bokeh_plot(min_x, max_x, min_y, max_y)
+	draw_edges(map, edge_data)
+	draw_nodes(map, node_data)
+
+	if export:
+		from bokeh.io import export_png
+
+		frames_dir = tempfile.mkdtemp(prefix='benchmark-frames-')
+
+	timings = []
+	path_renderers = []
+	for step_idx in range(min(frames, len(algorithm_steps))):
+		start = time.perf_counter()
+		with instrumentation.timer('frame'):
+			draw_frame(map, G, node_data, algorithm_data_sources[step_idx], algorithm_steps[step_idx], path_renderers, mercator_positions)
+
+			if export:
+				with instrumentation.timer('frame.export_png'):
+					export_png(map, filename=os.path.join(frames_dir, f"frame_{step_idx:04d}.png"), width=800, height=800)
+
+		instrumentation.count('frames_rendered')
+		timings.append(time.perf_counter() - start)
+
+	return timings
+
+def run(name, stops_data, routes_data, start=None, end=None, repeat=3, frames=20, export=False, trace_memory=False):
+	"""Benchmarks every stage of the pipeline on one network, returns the results as a dict."""
+
+	G = create_graph(stops_data, routes_data)
+	if start not in G or end not in G:
+		start, end = endpoints(G)
+
+	algorithm_steps, _ = a_star.steps(G, start, end)
+	_, _, mercator_positions, *_ = prepare_visualization_data(G)
+
+	stages = {
+		'create_graph': lambda: create_graph(stops_data, routes_data),
+		'prepare_visualization_data': lambda: prepare_visualization_data(G),
+		'a_star.steps': lambda: a_star.steps(G, start, end),
+		'a_star.data': lambda: a_star.data(G, algorithm_steps, mercator_positions),
+	}
+
+	timings = {}
+	for stage, function in stages.items():
+		stage_timings, result = _measure(function, repeat)
+		timings[stage] = _summary(stage_timings)
+
+	algorithm_data_sources = result		# a_star.data ran last
+	if frames:
+		timings['frame'] = _summary(_frames(G, algorithm_steps, algorithm_data_sources, frames, export))
+
+	# one more pass with instrumentation on, for counters and memory peaks
+	instrumentation.reset()
+	instrumentation.enable(trace_memory=trace_memory)
+	try:
+		for function in stages.values():
+			function()
+		if frames:
+			_frames(G, algorithm_steps, algorithm_data_sources, frames, export)
+		report = instrumentation.report()
+	finally:
+		instrumentation.disable()
+		instrumentation.reset()
+
+	return {
+		'name': name,
+		'nodes': G.number_of_nodes(),
+		'edges': G.number_of_edges(),
+		'start': start,
+		'end': end,
+		'steps': len(algorithm_steps),
+		'timings': timings,
+		'instrumentation': report,
+	}
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help="numbers of stops of synthetic networks")
+	parser.add_argument('--fixture', default=FIXTURE, help="recorded stops and routes (e.g. a copy of api_cache.json) to benchmark too")
+	parser.add_argument('--no-fixture', action='store_true', help="benchmark synthetic networks only")
+	parser.add_argument('--record-fixture', metavar='API_CACHE', help="trim API_CACHE (e.g. api_cache.json) to the lines around --start and --end, save it as --fixture and exit")
+	parser.add_argument('--start', default=START_STOP_ID, help="start stop of A* on the fixture")
+	parser.add_argument('--end', default=END_STOP_ID, help="end stop of A* on the fixture")
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--frames', type=int, default=20, help="how many animation frames to draw (0 to skip)")
+	parser.add_argument('--export', action='store_true', help="also export frames to PNG (needs a browser and webdriver)")
+	parser.add_argument('--trace-memory', action='store_true', help="track memory peaks with tracemalloc in the instrumented pass")
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--output', default='benchmark.json')
+	args = parser.parse_args()
+
+	if args.record_fixture:
+		stops_data, routes_data = trim_fixture(*load_fixture(args.record_fixture), args.start, args.end)
+
+		os.makedirs(os.path.dirname(os.path.abspath(args.fixture)), exist_ok=True)
+		with open(args.fixture, 'w') as f:
+			json.dump({'stops_data': stops_data, 'routes_data': routes_data}, f, indent=1)
+
+		print(f"Saved {len(stops_data['result'])} stops and {len(routes_data['result'])} lines to {args.fixture}")
+		sys.exit()
+
+	networks = [(f"synthetic-{size}", *synthetic_network(size, seed=args.seed), None, None) for size in args.sizes]
+	if not args.no_fixture:
+		networks.append((os.path.basename(args.fixture), *load_fixture(args.fixture), args.start, args.end))
+
+	results = []
+	for name, stops_data, routes_data, start, end in networks:
+		result = run(name, stops_data, routes_data, start, end, args.repeat, args.frames, args.export, args.trace_memory)
+		results.append(result)
+
+		print(f"{name}: {result['nodes']} nodes, {result['edges']} edges, {result['steps']} A* steps")
+		for stage, timing in result['timings'].items():
+			print(f"    {stage:<28} {timing['min'] * 1000:>10.2f} ms (median {timing['median'] * 1000:.2f} ms)")
+		for counter, value in result['instrumentation']['counters'].items():
+			print(f"    {counter:<28} {value:>10}")
+
+	with open(args.output, 'w') as f:
+		json.dump({
+			'python': sys.version,
+			'platform': platform.platform(),
+			'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+			'arguments': vars(args),
+			'results': results,
+		}, f, indent=4)
+
+	print(f"Results saved to {args.output}")
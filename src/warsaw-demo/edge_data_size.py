@@ -0,0 +1,51 @@
+"""Compares size of edge data embedded in HTML: one two-point line per edge vs merged per-line polylines."""
+
+from bokeh.embed import file_html
+from bokeh.models import ColumnDataSource
+from bokeh.resources import CDN
+
+from ztm_data.api import get_api_key, get_stop_data, get_routes_data
+from visualization import create_graph, prepare_visualization_data, polyline_edge_data
+
+def per_edge_data(G, mercator_positions):
+	"""Edge data the way it used to be prepared, one two-point line for each edge."""
+
+	return dict(
+		xs=[[mercator_positions[start][0], mercator_positions[end][0]] for start, end in G.edges()],
+		ys=[[mercator_positions[start][1], mercator_positions[end][1]] for start, end in G.edges()],
+		line=[line for _, _, line in G.edges(data='line')],
+		color=["gray"] * len(G.edges())
+	)
+
+def _html_size(source):
+	return len(file_html(source, resources=CDN, title="").encode())
+
+def serialized_size(data):
+	"""
+	Size in bytes a ColumnDataSource adds to an embedded HTML document.
+
+	Document JSON alone replaces binary buffers (numpy arrays) with references, so it would leave their bytes out.
+	"""
+
+	return _html_size(ColumnDataSource(data)) - _html_size(ColumnDataSource())
+
+def compare(G):
+	_, _, mercator_positions, *_ = prepare_visualization_data(G)
+
+	old = per_edge_data(G, mercator_positions)
+	new = polyline_edge_data(G, mercator_positions)
+
+	old_size = serialized_size(old)
+	new_size = serialized_size(new)
+
+	print(f"per edge:  {len(old['xs']):>7} lines, {sum(len(xs) for xs in old['xs']):>7} vertices, {old_size:>10} bytes")
+	print(f"polylines: {len(new['xs']):>7} lines, {sum(len(xs) for xs in new['xs']):>7} vertices, {new_size:>10} bytes")
+	print(f"saved:     {old_size - new_size:>10} bytes ({(old_size - new_size) / old_size:.1%})")
+
+if __name__ == '__main__':
+	api_key = get_api_key()
+
+	stops_data = get_stop_data(api_key)
+	routes_data = get_routes_data(api_key)
+
+	compare(create_graph(stops_data, routes_data))
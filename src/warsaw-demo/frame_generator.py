@@ -3,17 +3,45 @@ import os
 from bokeh.io import export_png
 
 from ztm_data.api import get_api_key, get_stop_data, get_routes_data
+from tile_cache import local_tile_url, zoom_for_width
 from visualization import create_graph, prepare_visualization_data, create_bokeh_plot, create_tile_map, draw_edges, draw_nodes, draw_path
 import a_star
+import instrumentation
 
-def visualize_graph(G, start_stop_id=None, end_stop_id=None):
+@instrumentation.timed('frame.draw')
+def draw_frame(map, G, node_data, new_node_data, algorithm_step, path_renderers, mercator_positions):
+	"""Updates the plot to show a single A* step: node colors and fading paths (path_renderers is updated in place)."""
+
+	# Update node data
+	node_data.data = new_node_data
+
+	for path_renderer in path_renderers:
+		try:
+			map.renderers.remove(path_renderer)
+		except ValueError:
+			pass
+	path_renderers.clear()
+
+	# fade out the paths
+	for path_data in algorithm_step['all_paths']:
+		path = path_data['path']
+		frame_number = path_data['frame_number']
+		age = algorithm_step['step_idx'] - frame_number
+		fade_speed = 0.2
+		alpha = max(0, 1 - age * fade_speed)
+
+		path_renderers.append(draw_path(map, G, path, mercator_positions, color=f"rgba(255, 0, 0, {alpha})"))
+
+def visualize_graph(G, start_stop_id=None, end_stop_id=None, frame_size=2000):
 	"""Visualizes the graph with bokeh."""
 
 	node_data, edge_data, mercator_positions, min_x, max_x, min_y, max_y, initial_ratio = prepare_visualization_data(G)
 	map = create_bokeh_plot(min_x, max_x, min_y, max_y)
 
-	# background
-	create_tile_map(map)
+	# background, served from a local cache so frames don't wait for tiles over the network
+	zoom = zoom_for_width(min_x, max_x, frame_size)
+	zooms = range(zoom - 1, zoom + 2)
+	create_tile_map(map, local_tile_url(min_x, max_x, min_y, max_y, zooms), zooms)
 
 	# content
 	draw_edges(map, edge_data)
@@ -33,44 +61,30 @@ def visualize_graph(G, start_stop_id=None, end_stop_id=None):
 
 	if algorithm_data_sources:
 		for step_idx, new_node_data in enumerate(algorithm_data_sources):
-			# Update node data
-			node_data.data = new_node_data
-
 			# Frame skipping block. In case of a bug, uncomment and change the if statement to the number of the last successful frame (minus about 10 to work around fading)
 			# if (step_idx < 1390):
 			# 	print(f"Skipping frame {step_idx}")
 			# 	continue
 
-			for path_renderer in path_renderers:
-				try:
-					path_renderers.remove(path_renderer)
-					map.renderers.remove(path_renderer)
-				except:
-					pass
-
-			# fade out the paths
-			for path_data in algorithm_steps[step_idx]['all_paths']:
-				path = path_data['path']
-				frame_number = path_data['frame_number']
-				age = step_idx - frame_number
-				fade_speed = 0.2
-				alpha = max(0, 1 - age * fade_speed)
-
-				path_renderers.append(draw_path(map, G, path, mercator_positions, color=f"rgba(255, 0, 0, {alpha})"))
-
-			# Save the current frame as an image
-			filename = os.path.join(frames_dir, f"frame_{step_idx:04d}.png")
-			try:
-				export_png(
-					obj = map,
-					filename=filename,
-					width=2000,
-					height=2000,
-					timeout=10
-				)
-			except Exception as e:
-				print(f"Error saving frame {step_idx} (caused by {e}), skipping")
+			with instrumentation.timer('frame'):
+				draw_frame(map, G, node_data, new_node_data, algorithm_steps[step_idx], path_renderers, mercator_positions)
 
+				# Save the current frame as an image
+				filename = os.path.join(frames_dir, f"frame_{step_idx:04d}.png")
+				try:
+					with instrumentation.timer('frame.export_png'):
+						export_png(
+							obj = map,
+							filename=filename,
+							width=frame_size,
+							height=frame_size,
+							timeout=10
+						)
+				except Exception as e:
+					print(f"Error saving frame {step_idx} (caused by {e}), skipping")
+					continue
+
+			instrumentation.count('frames_rendered')
 			print(f"Saved frame: {filename}")
 	else:
 		print("Could not compute A* algorihtm.")
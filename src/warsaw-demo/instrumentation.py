@@ -0,0 +1,122 @@
+"""
+Opt-in instrumentation: per-stage timers, counters and memory high-water marks.
+
+Disabled by default, so it costs next to nothing. Enable it with enable() or by setting WARSAW_DEMO_PROFILE
+to a file path, the report is then saved there as JSON when the program exits.
+"""
+
+import atexit
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+enabled = False
+
+_timers = {}		# stage -> {'calls', 'total', 'max'} (seconds)
+_counters = {}		# name -> value
+_peak_memory = {}	# stage -> highest traced memory in bytes
+_memory_stack = []	# peaks of stages currently running, nested stages reset tracemalloc's peak
+
+def enable(trace_memory=False):
+	"""Turns instrumentation on. Tracking memory (with tracemalloc) slows everything down noticeably."""
+	global enabled
+
+	enabled = True
+	if trace_memory and not tracemalloc.is_tracing():
+		tracemalloc.start()
+
+def disable():
+	global enabled
+
+	enabled = False
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()
+
+def reset():
+	_timers.clear()
+	_counters.clear()
+	_peak_memory.clear()
+	_memory_stack.clear()
+
+@contextmanager
+def timer(stage):
+	"""Measures time (and peak memory, if traced) spent in a stage."""
+
+	if not enabled:
+		yield
+		return
+
+	tracing = tracemalloc.is_tracing()
+	if tracing:
+		if _memory_stack:
+			_memory_stack[-1] = max(_memory_stack[-1], tracemalloc.get_traced_memory()[1])
+		_memory_stack.append(0)
+		tracemalloc.reset_peak()
+
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+
+		stats = _timers.setdefault(stage, {'calls': 0, 'total': 0.0, 'max': 0.0})
+		stats['calls'] += 1
+		stats['total'] += elapsed
+		stats['max'] = max(stats['max'], elapsed)
+
+		if tracing and tracemalloc.is_tracing():
+			peak = max(_memory_stack.pop(), tracemalloc.get_traced_memory()[1])
+			_peak_memory[stage] = max(_peak_memory.get(stage, 0), peak)
+			if _memory_stack:
+				_memory_stack[-1] = max(_memory_stack[-1], peak)
+
+def timed(stage):
+	"""Decorator version of timer()."""
+
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return function(*args, **kwargs)
+
+			with timer(stage):
+				return function(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
+def count(name, value=1):
+	"""Adds value to a counter. Hot loops should count locally and call this once."""
+
+	if enabled:
+		_counters[name] = _counters.get(name, 0) + value
+
+def report():
+	"""Returns everything measured so far as a JSON-serializable dict."""
+
+	result = {
+		'timers': {stage: dict(stats) for stage, stats in _timers.items()},
+		'counters': dict(_counters),
+		'peak_memory': dict(_peak_memory),
+	}
+
+	try:
+		import resource
+		# ru_maxrss is in kilobytes on Linux
+		result['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+	except ImportError:
+		pass		# not available on Windows
+
+	return result
+
+def save(path):
+	with open(path, 'w') as f:
+		json.dump(report(), f, indent=4)
+
+if os.environ.get('WARSAW_DEMO_PROFILE'):
+	enable(trace_memory=bool(os.environ.get('WARSAW_DEMO_TRACE_MEMORY')))
+	atexit.register(save, os.environ['WARSAW_DEMO_PROFILE'])
@@ -0,0 +1,102 @@
+"""Server-side level of detail for the full network map: viewport culling, stop decimation and merged edges."""
+
+from visualization import line_polylines, line_codes
+
+class LevelOfDetail:
+	"""
+	Picks what to send to the browser for the current viewport.
+
+	Stops outside the viewport are dropped and, when there are still too many of them, only one grey stop per
+	screen cell is kept (stops coloured by the algorithm are always kept). Edges are sent one by one when zoomed in,
+	and as per-line polylines with vertices closer than a pixel or so merged together when zoomed out.
+	"""
+
+	def __init__(self, G, mercator_positions, max_nodes=3000, max_edges=5000, default_colors=("lightgrey", "#d3d3d3")):
+		import numpy as np		# imported lazily, like in visualization, it's slow to import
+
+		self.max_nodes = max_nodes
+		self.max_edges = max_edges
+		# a_star.data fades visited stops into "#d3d3d3", which is lightgrey as well
+		self.default_colors = set(default_colors)
+
+		nodes = list(G.nodes())
+		self.node_xs = np.array([mercator_positions[node][0] for node in nodes])
+		self.node_ys = np.array([mercator_positions[node][1] for node in nodes])
+
+		codes = line_codes(G)
+
+		edges = list(G.edges(data='line'))
+		self.edge_lines = np.array([codes[line] for _, _, line in edges], dtype=np.int32)
+		self.edge_x0 = np.array([mercator_positions[start][0] for start, _, _ in edges])
+		self.edge_y0 = np.array([mercator_positions[start][1] for start, _, _ in edges])
+		self.edge_x1 = np.array([mercator_positions[end][0] for _, end, _ in edges])
+		self.edge_y1 = np.array([mercator_positions[end][1] for _, end, _ in edges])
+
+		self.polylines = []
+		for line, polyline_nodes in line_polylines(G):
+			xs = np.array([mercator_positions[node][0] for node in polyline_nodes])
+			ys = np.array([mercator_positions[node][1] for node in polyline_nodes])
+			self.polylines.append((codes[line], xs, ys, xs.min(), xs.max(), ys.min(), ys.max()))
+
+	def node_indices(self, node_colors, x_start, x_end, y_start, y_end):
+		"""Returns indexes (in G.nodes() order) of the stops to draw in the viewport."""
+		import numpy as np
+
+		visible = (self.node_xs >= x_start) & (self.node_xs <= x_end) & (self.node_ys >= y_start) & (self.node_ys <= y_end)
+		indices = np.flatnonzero(visible)
+		if len(indices) <= self.max_nodes:
+			return indices
+
+		highlighted = np.array([node_colors[i] not in self.default_colors for i in indices], dtype=bool)
+
+		# one grey stop per cell of a grid laid over the viewport
+		cell_size = max(x_end - x_start, y_end - y_start) / np.sqrt(self.max_nodes)
+		grey = indices[~highlighted]
+		cells = np.floor((self.node_xs[grey] - x_start) / cell_size) * 1e6 + np.floor((self.node_ys[grey] - y_start) / cell_size)
+		_, first_in_cell = np.unique(cells, return_index=True)
+
+		return np.sort(np.concatenate([indices[highlighted], grey[first_in_cell]]))
+
+	def node_data(self, full_node_data, x_start, x_end, y_start, y_end):
+		"""Cuts a full node data dict (e.g. a step from a_star.data) down to the viewport."""
+
+		indices = self.node_indices(full_node_data['color'], x_start, x_end, y_start, y_end)
+		return {key: [values[i] for i in indices] for key, values in full_node_data.items()}
+
+	def edge_data(self, x_start, x_end, y_start, y_end):
+		"""Returns edge data (same columns as from prepare_visualization_data) for the viewport."""
+		import numpy as np
+
+		visible = ~(
+			(np.maximum(self.edge_x0, self.edge_x1) < x_start) | (np.minimum(self.edge_x0, self.edge_x1) > x_end) |
+			(np.maximum(self.edge_y0, self.edge_y1) < y_start) | (np.minimum(self.edge_y0, self.edge_y1) > y_end)
+		)
+		indices = np.flatnonzero(visible)
+
+		if len(indices) <= self.max_edges:
+			return dict(
+				xs=np.stack([self.edge_x0[indices], self.edge_x1[indices]], axis=1).tolist(),
+				ys=np.stack([self.edge_y0[indices], self.edge_y1[indices]], axis=1).tolist(),
+				line=self.edge_lines[indices],
+				color=["gray"] * len(indices)
+			)
+
+		# zoomed out, merge edges into polylines and drop vertices that would land on (almost) the same pixel
+		tolerance = max(x_end - x_start, y_end - y_start) / 1000
+		xs, ys, lines = [], [], []
+		for line, line_xs, line_ys, min_x, max_x, min_y, max_y in self.polylines:
+			if max_x < x_start or min_x > x_end or max_y < y_start or min_y > y_end:
+				continue
+
+			keep = [0]
+			for i in range(1, len(line_xs) - 1):
+				if abs(line_xs[i] - line_xs[keep[-1]]) + abs(line_ys[i] - line_ys[keep[-1]]) >= tolerance:
+					keep.append(i)
+			keep.append(len(line_xs) - 1)
+
+			# lists, numpy arrays would be sent as a separate binary buffer each
+			xs.append(line_xs[keep].tolist())
+			ys.append(line_ys[keep].tolist())
+			lines.append(line)
+
+		return dict(xs=xs, ys=ys, line=np.array(lines, dtype=np.int32), color=["gray"] * len(lines))
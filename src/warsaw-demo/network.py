@@ -0,0 +1,272 @@
+"""Incremental updates of the transport network graph when ZTM data changes."""
+
+from ztm_data.api import get_api_key, get_stop_data, get_routes_data
+from visualization import create_stop_lookup, route_stop_ids
+
+def _edge_key(start, end):
+	return (start, end) if start <= end else (end, start)
+
+def _stop_attributes(stop):
+	return dict(
+		pos=(stop.dlug_geo, stop.szer_geo),
+		label=f"{stop.nazwa_zespolu} {stop.slupek}"
+	)
+
+class NetworkState:
+	"""
+	Keeps a graph (same as the one from create_graph) in sync with ZTM stop and route payloads.
+
+	Instead of rebuilding everything, update() diffs new payloads against the current snapshot, changes the graph
+	in place and invalidates only the derived data (projected positions, cached routes) touched by the change.
+	"""
+
+	def __init__(self, stops_data, routes_data):
+		import networkx as nx
+
+		self.G = nx.Graph()
+		self.stop_lookup = {}
+
+		self._routes = {}			# (line, direction) -> route payload
+		self._route_order = {}		# (line, direction) -> position in the payload, decides edge labels
+		self._route_stops = {}		# (line, direction) -> ids of stops along the route
+		self._stop_routes = {}		# stop id -> routes referencing it (even if it's missing from stop_lookup)
+		self._node_refs = {}		# node -> number of times it appears on routes
+		self._node_stop_ids = {}	# node -> stop id
+		self._edge_routes = {}		# edge -> {(line, direction): number of times it appears on that route}
+
+		self._transformer = None
+		self._mercator_positions = {}
+		self._cached_routes = {}	# (start, end) -> ((trace, came_from), nodes the result depends on)
+		self._listeners = []
+
+		self.update(stops_data, routes_data)
+
+	def add_listener(self, callback):
+		"""Registers a callback called with the diff after every update (for invalidating other derived data)."""
+
+		self._listeners.append(callback)
+
+	def remove_listener(self, callback):
+		if callback in self._listeners:
+			self._listeners.remove(callback)
+
+	@property
+	def mercator_positions(self):
+		"""Web Mercator positions of all nodes, projected lazily and only for nodes that changed."""
+
+		missing = [node for node in self.G.nodes() if node not in self._mercator_positions]
+		if missing:
+			if self._transformer is None:
+				import pyproj
+
+				self._transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True)
+
+			for node in missing:
+				lon, lat = self.G.nodes[node]['pos']
+				self._mercator_positions[node] = self._transformer.transform(lon, lat)
+
+		return self._mercator_positions
+
+	def cached_route(self, start, end, compute):
+		"""
+		Returns a cached route search result, calling compute(G, start, end) on a miss.
+
+		compute should return (trace, came_from), like a_star.graph_search does. Only the compact trace is kept,
+		full per-step snapshots (a_star.replay) take memory proportional to steps * nodes.
+		"""
+
+		key = (start, end)
+		if key not in self._cached_routes:
+			trace, came_from = compute(self.G, start, end)
+			explored = set(came_from) | set(came_from.values()) | {start, end}
+			self._cached_routes[key] = ((trace, came_from), explored)
+
+		return self._cached_routes[key][0]
+
+	def update(self, stops_data, routes_data):
+		"""Applies new stop and route payloads in place. Returns a diff describing what changed."""
+
+		diff = dict(
+			added_nodes=set(),
+			removed_nodes=set(),
+			changed_nodes=set(),
+			added_edges=set(),
+			removed_edges=set(),
+			changed_edges=set()
+		)
+
+		# stops
+		new_lookup = create_stop_lookup(stops_data)
+		old_lookup = self.stop_lookup
+
+		added_stops = new_lookup.keys() - old_lookup.keys()
+		removed_stops = old_lookup.keys() - new_lookup.keys()
+		changed_stops = {
+			stop_id for stop_id in new_lookup.keys() & old_lookup.keys()
+			if _stop_attributes(new_lookup[stop_id]) != _stop_attributes(old_lookup[stop_id])
+		}
+
+		self.stop_lookup = new_lookup
+
+		# routes
+		new_routes = {
+			(line, direction): route
+			for line, directions in routes_data['result'].items()
+			for direction, route in directions.items()
+		}
+
+		affected_routes = {key for key in self._routes.keys() | new_routes.keys() if self._routes.get(key) != new_routes.get(key)}
+		new_order = {key: idx for idx, key in enumerate(new_routes)}
+
+		# adding or removing a stop changes the edges of every route going through it
+		for stop_id in added_stops | removed_stops:
+			affected_routes |= self._stop_routes.get(stop_id, set())
+
+		# dicts used as ordered sets, so nodes and edges are added to the graph in a deterministic order
+		touched_edges = {}
+		touched_nodes = {}
+
+		# same order as in the payload (and in create_graph), removed routes after that, so the result doesn't
+		# depend on set iteration order
+		for key in [*new_routes, *sorted(self._routes.keys() - new_routes.keys())]:
+			if key not in affected_routes:
+				if self._route_order.get(key) != new_order[key]:
+					# route moved in the payload, labels of its edges may change
+					stop_ids = self._route_stops[key]
+					touched_edges.update(dict.fromkeys(_edge_key(start, end) for start, end in zip(stop_ids, stop_ids[1:])))
+				continue
+
+			if key in self._routes:
+				self._remove_route(key, touched_nodes, touched_edges)
+
+			if key in new_routes:
+				self._add_route(key, new_routes[key], touched_nodes, touched_edges)
+
+		self._route_order = new_order
+
+		# apply to the graph
+		for node in touched_nodes:
+			exists = self._node_refs.get(node, 0) > 0
+			if exists and node not in self.G:
+				self.G.add_node(node, **_stop_attributes(self.stop_lookup[self._node_stop_ids[node]]))
+				diff['added_nodes'].add(node)
+			elif not exists and node in self.G:
+				self.G.remove_node(node)
+				diff['removed_nodes'].add(node)
+
+		for stop_id in changed_stops:
+			node = str(stop_id)
+			if node in self.G and node not in diff['added_nodes']:
+				self.G.nodes[node].update(_stop_attributes(self.stop_lookup[stop_id]))
+				diff['changed_nodes'].add(node)
+
+		for edge in touched_edges:
+			routes = self._edge_routes.get(edge)
+			if routes:
+				# same as in create_graph, the line of the route that comes last in the payload wins
+				line, _ = max(routes, key=self._route_order.__getitem__)
+				if not self.G.has_edge(*edge):
+					self.G.add_edge(*edge, line=line)
+					diff['added_edges'].add(edge)
+				elif self.G.edges[edge]['line'] != line:
+					self.G.edges[edge]['line'] = line
+					diff['changed_edges'].add(edge)
+			elif edge not in self._edge_routes and self.G.has_edge(*edge):
+				self.G.remove_edge(*edge)
+				diff['removed_edges'].add(edge)
+
+		# removing a node takes its edges with it
+		for edge in touched_edges:
+			if edge not in self._edge_routes and (edge[0] in diff['removed_nodes'] or edge[1] in diff['removed_nodes']):
+				diff['removed_edges'].add(edge)
+
+		self._invalidate(diff)
+
+		for callback in self._listeners:
+			callback(diff)
+
+		return diff
+
+	def _add_route(self, key, route, touched_nodes, touched_edges):
+		self._routes[key] = route
+
+		for stop_info in route.values():
+			self._stop_routes.setdefault((stop_info['nr_zespolu'], stop_info['nr_przystanku']), set()).add(key)
+
+		stop_ids = []
+		for stop_id in route_stop_ids(route, self.stop_lookup):
+			node = str(stop_id)	  # same as in create_graph, nodes are strings for bokeh
+			self._node_stop_ids[node] = stop_id
+			stop_ids.append(node)
+		self._route_stops[key] = stop_ids
+
+		for node in stop_ids:
+			self._node_refs[node] = self._node_refs.get(node, 0) + 1
+			touched_nodes[node] = None
+
+		for start, end in zip(stop_ids, stop_ids[1:]):
+			edge = _edge_key(start, end)
+			routes = self._edge_routes.setdefault(edge, {})
+			routes[key] = routes.get(key, 0) + 1
+			touched_edges[edge] = None
+
+	def _remove_route(self, key, touched_nodes, touched_edges):
+		route = self._routes.pop(key)
+
+		for stop_info in route.values():
+			routes = self._stop_routes.get((stop_info['nr_zespolu'], stop_info['nr_przystanku']))
+			if routes:
+				routes.discard(key)
+
+		stop_ids = self._route_stops.pop(key)
+
+		for node in stop_ids:
+			self._node_refs[node] -= 1
+			if not self._node_refs[node]:
+				del self._node_refs[node]
+			touched_nodes[node] = None
+
+		for start, end in zip(stop_ids, stop_ids[1:]):
+			edge = _edge_key(start, end)
+			routes = self._edge_routes[edge]
+			routes[key] -= 1
+			if not routes[key]:
+				del routes[key]
+			if not routes:
+				del self._edge_routes[edge]
+			touched_edges[edge] = None
+
+	def _invalidate(self, diff):
+		stale_nodes = diff['removed_nodes'] | diff['changed_nodes']
+
+		for node in stale_nodes:
+			self._mercator_positions.pop(node, None)
+
+		if diff['added_nodes'] or diff['added_edges']:
+			# new connections can make any route shorter
+			self._cached_routes.clear()
+			return
+
+		for edge in diff['removed_edges']:
+			stale_nodes = stale_nodes | set(edge)
+
+		for key, (_, explored) in list(self._cached_routes.items()):
+			if not explored.isdisjoint(stale_nodes):
+				del self._cached_routes[key]
+
+_network = None
+
+def get_network():
+	"""
+	Returns the shared NetworkState, fetching data and building the graph on first use.
+
+	Bokeh server runs server.py again for every session, but imported modules stay loaded, so the graph is built
+	only once per process.
+	"""
+	global _network
+
+	if _network is None:
+		api_key = get_api_key()
+		_network = NetworkState(get_stop_data(api_key), get_routes_data(api_key))
+
+	return _network
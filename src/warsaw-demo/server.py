@@ -1,19 +1,33 @@
-from bokeh.models import Slider
+from bokeh.models import Slider, Button
 from bokeh.layouts import column, row
 from bokeh.io import curdoc
 
 from ztm_data.api import get_api_key, get_stop_data, get_routes_data
-from visualization import create_graph, prepare_visualization_data, create_bokeh_plot, create_tile_map, draw_edges, draw_nodes, create_zoom_callback, enable_wheel_zoom, create_legend, create_description, reconstruct_path, draw_path
+from network import get_network
+from lod import LevelOfDetail
+from tile_cache import TILE_ROUTE, TILE_URL, TileCache, tile_handler
+from visualization import prepare_visualization_data, create_bokeh_plot, create_tile_map, draw_edges, draw_nodes, create_zoom_callback, enable_wheel_zoom, create_legend, create_description, reconstruct_path, draw_path
 import a_star
 
-def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
-	"""Modifies bokeh document to visualize the graph."""
+# You can set initial start and end stops here if needed, or control them via URL parameters/widgets later
+# START_STOP_ID, END_STOP_ID = "('1238', '01')", "('1542', '01')"
+START_STOP_ID, END_STOP_ID = "('1238', '01')", "('7006', '01')"
+
+TILE_ZOOMS = range(10, 16)
+
+def modify_document(doc, network, start_stop_id=None, end_stop_id=None, tile_url=None):
+	"""Modifies bokeh document to visualize the graph. Without tile_url, map tiles come from the provider."""
+
+	G = network.G
 
-	node_data, edge_data, mercator_positions, min_x, max_x, min_y, max_y, initial_ratio = prepare_visualization_data(G)
-	map_plot = create_bokeh_plot(min_x, max_x, min_y, max_y)
+	# the network is shared by all sessions and a refresh in any of them changes it in place, so every session works
+	# on its own copy of positions and rebuilds its data when notified (see rebuild below)
+	mercator_positions = dict(network.mercator_positions)
+	node_data, edge_data, _, min_x, max_x, min_y, max_y, initial_ratio = prepare_visualization_data(G, mercator_positions)
+	map_plot = create_bokeh_plot(min_x, max_x, min_y, max_y, output_backend="webgl")
 
-	# background
-	create_tile_map(map_plot)
+	# background, served by this server from a local cache when started with `python server.py` (see main)
+	create_tile_map(map_plot, tile_url, TILE_ZOOMS)
 
 	# content
 	draw_edges(map_plot, edge_data)
@@ -21,12 +35,39 @@ def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
 
 	# path
 	# A* algorithm
-	algorithm_steps, came_from = a_star.steps(G, start_stop_id, end_stop_id)
+	trace, came_from = network.cached_route(start_stop_id, end_stop_id, a_star.graph_search)
+	algorithm_steps = a_star.replay(G, start_stop_id, end_stop_id, trace)
 	algorithm_data_sources = a_star.data(G, algorithm_steps, mercator_positions)
 
 	shortest_path = reconstruct_path(came_from, start_stop_id, end_stop_id)
 	shortest_path_renderer = None
 
+	# level of detail, only what's visible (and distinguishable) gets sent to the browser
+	lod = LevelOfDetail(G, mercator_positions)
+	current_node_data = algorithm_data_sources[0] if algorithm_data_sources else dict(node_data.data)
+	detail_update_pending = False
+
+	def update_detail():
+		nonlocal detail_update_pending
+		detail_update_pending = False
+
+		viewport = (map_plot.x_range.start, map_plot.x_range.end, map_plot.y_range.start, map_plot.y_range.end)
+		node_data.data = lod.node_data(current_node_data, *viewport)
+		edge_data.data = lod.edge_data(*viewport)
+
+	def schedule_detail_update(attr, old, new):
+		# ranges change a few times per zoom/pan (start, end and the aspect ratio fix), update only once
+		nonlocal detail_update_pending
+		if not detail_update_pending:
+			detail_update_pending = True
+			doc.add_timeout_callback(update_detail, 100)
+
+	for plot_range in (map_plot.x_range, map_plot.y_range):
+		plot_range.on_change('start', schedule_detail_update)
+		plot_range.on_change('end', schedule_detail_update)
+
+	update_detail()
+
 	if algorithm_data_sources:
 		# Slider to step through the algorithm
 		slider = Slider(
@@ -38,9 +79,10 @@ def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
 		)
 
 		def update_data(attr, old, new):
+			nonlocal current_node_data
 			step = slider.value
-			new_node_data = algorithm_data_sources[step]
-			node_data.data = new_node_data
+			current_node_data = algorithm_data_sources[step]
+			update_detail()
 
 			if slider.value == slider.end:
 				global shortest_path_renderer
@@ -54,6 +96,49 @@ def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
 
 		slider.on_change('value', update_data)
 
+		def rebuild():
+			"""Recomputes everything derived from the network, after it was updated (by any session)."""
+			nonlocal mercator_positions, algorithm_data_sources, shortest_path, lod, current_node_data
+
+			mercator_positions = dict(network.mercator_positions)
+			new_node_data, *_ = prepare_visualization_data(G, mercator_positions)
+			lod = LevelOfDetail(G, mercator_positions)
+
+			trace, came_from = network.cached_route(start_stop_id, end_stop_id, a_star.graph_search)
+			algorithm_steps = a_star.replay(G, start_stop_id, end_stop_id, trace)
+			algorithm_data_sources = a_star.data(G, algorithm_steps, mercator_positions)
+			shortest_path = reconstruct_path(came_from, start_stop_id, end_stop_id)
+
+			if algorithm_data_sources:
+				slider.end = max(len(algorithm_data_sources) - 1, 1)
+				slider.value = min(slider.value, len(algorithm_data_sources) - 1)
+				current_node_data = algorithm_data_sources[slider.value]
+			else:
+				current_node_data = dict(new_node_data.data)
+			update_detail()
+
+		def network_updated(diff):
+			# called from whichever session refreshed, document changes have to go through this session's callbacks
+			if any(diff.values()):
+				doc.add_next_tick_callback(rebuild)
+
+		network.add_listener(network_updated)
+		doc.on_session_destroyed(lambda session_context: network.remove_listener(network_updated))
+
+		def refresh_data():
+			"""Fetches fresh ZTM data and applies only the differences to the graph (every session gets rebuilt)."""
+
+			api_key = get_api_key()
+			diff = network.update(get_stop_data(api_key, refresh=True), get_routes_data(api_key, refresh=True))
+			if not any(diff.values()):
+				print("Network data is up to date")
+				return
+
+			print(f"Network updated: {', '.join(f'{len(changes)} {kind}' for kind, changes in diff.items() if changes)}")
+
+		refresh_button = Button(label="Refresh network data")
+		refresh_button.on_click(refresh_data)
+
 		# utils
 		create_zoom_callback(map_plot, initial_ratio)
 		enable_wheel_zoom(map_plot)
@@ -62,7 +147,7 @@ def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
 		map_plot.add_layout(create_legend(map_plot), 'below')
 		map_plot.sizing_mode = "scale_height"
 
-		controls = column(create_description(), slider)
+		controls = column(create_description(), slider, refresh_button)
 
 		layout = row(map_plot, controls)
 		layout.sizing_mode = "stretch_both"
@@ -72,15 +157,44 @@ def modify_document(doc, G, start_stop_id=None, end_stop_id=None):
 	else:
 		print("Could not compute A* algorihtm.")
 
-api_key = get_api_key()
-
-stops_data = get_stop_data(api_key)
-routes_data = get_routes_data(api_key)
-
-# Create the graph - do this once when the script starts
-G = create_graph(stops_data, routes_data)
-
-# Call modify_document to setup the plot in the Bokeh server document
-# You can set initial start and end stops here if needed, or control them via URL parameters/widgets later
-# modify_document(curdoc(), G, "('1238', '01')", "('1542', '01')")
-modify_document(curdoc(), G, "('1238', '01')", "('7006', '01')")
+def main():
+	import argparse
+	import threading
+	from bokeh.server.server import Server
+
+	parser = argparse.ArgumentParser(description="Serves the network map, with map tiles served from the local cache.")
+	parser.add_argument('--address', default='localhost', help="address to listen on (e.g. 0.0.0.0 to allow remote access)")
+	parser.add_argument('--port', type=int, default=5006)
+	parser.add_argument('--allow-websocket-origin', action='append', default=None, help="host[:port] the app is opened from, when it's not localhost (can be repeated)")
+	parser.add_argument('--tiles', default='tiles.mbtiles', help="tile cache file")
+	parser.add_argument('--show', action='store_true', help="open the app in a browser")
+	args = parser.parse_args()
+
+	# The graph is built once per server process (not per session), later updates are applied in place
+	network = get_network()
+
+	# missing tiles are downloaded in the background so pages don't wait for them (the map fills in gradually),
+	# run `python tile_cache.py` beforehand to have them all from the start
+	cache = TileCache(args.tiles)
+	_, _, _, min_x, max_x, min_y, max_y, _ = prepare_visualization_data(network.G, network.mercator_positions)
+	threading.Thread(target=cache.seed, args=(min_x, max_x, min_y, max_y, TILE_ZOOMS), daemon=True).start()
+
+	server = Server(
+		{'/': lambda doc: modify_document(doc, network, START_STOP_ID, END_STOP_ID, TILE_URL)},
+		address=args.address,
+		port=args.port,
+		allow_websocket_origin=args.allow_websocket_origin,
+		extra_patterns=[(TILE_ROUTE, tile_handler(cache))]
+	)
+	server.start()
+	print(f"Serving on http://{args.address}:{args.port}/")
+
+	if args.show:
+		server.io_loop.add_callback(server.show, '/')
+	server.io_loop.start()
+
+if __name__ == '__main__':
+	main()
+else:
+	# `bokeh serve server.py` runs this file for every session, it can't serve tiles so they come from the provider
+	modify_document(curdoc(), get_network(), START_STOP_ID, END_STOP_ID)
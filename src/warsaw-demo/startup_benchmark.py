@@ -0,0 +1,58 @@
+"""Measures how long importing each module takes, with a `python -X importtime` breakdown of the slowest imports."""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULES = ['ztm_data.api', 'a_star', 'visualization', 'network', 'timetable', 'tile_cache', 'lod']
+
+def import_times(module):
+	"""
+	Imports module in a fresh interpreter and returns ({package imported by it: cumulative time in us}, total time in us).
+
+	Packages loaded by the interpreter itself on startup are left out.
+	"""
+
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=os.path.dirname(os.path.abspath(__file__)),
+		capture_output=True,
+		text=True,
+		check=True
+	)
+
+	entries = []
+	for line in result.stderr.splitlines():
+		# import time: self [us] | cumulative | imported package (indented by nesting level)
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+
+		_, cumulative, package = line.removeprefix('import time:').split('|')
+		depth = (len(package) - len(package.lstrip()) - 1) // 2
+		entries.append((package.strip(), depth, int(cumulative)))
+
+	# entries are listed after their dependencies, so everything nested right before the module belongs to it
+	module_idx = max(i for i, (package, depth, _) in enumerate(entries) if package == module and depth == 0)
+	first_idx = module_idx
+	while first_idx > 0 and entries[first_idx - 1][1] > 0:
+		first_idx -= 1
+
+	times = {package: cumulative for package, _, cumulative in entries[first_idx:module_idx]}
+
+	return times, entries[module_idx][2]
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('modules', nargs='*', default=MODULES)
+	parser.add_argument('--top', type=int, default=5, help="how many of the slowest top-level imports to show per module")
+	args = parser.parse_args()
+
+	for module in args.modules:
+		times, total = import_times(module)
+		print(f"{module:<20} {total / 1000:>8.1f} ms")
+
+		# only top-level packages, their submodules are already counted in
+		top_level = {package: time for package, time in times.items() if '.' not in package}
+		for package, time in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+			print(f"    {package:<16} {time / 1000:>8.1f} ms")
@@ -0,0 +1,89 @@
+"""Offline tests of the tile cache, tiles come from a local stand-in instead of the tile provider."""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from tile_cache import TILE_ROUTE, TileCache, TileServer, tile_handler, tile_range
+
+# Warsaw, roughly
+BOUNDS = (2_320_000, 2_365_000, 6_820_000, 6_860_000)
+URL = "https://tiles.invalid/{z}/{x}/{y}.png"
+
+def fake_tile(url):
+	return url.encode()
+
+@pytest.fixture
+def cache(tmp_path):
+	return TileCache(str(tmp_path / 'tiles.mbtiles'))
+
+def test_seed_stores_every_tile_in_bounds(cache):
+	first_x, last_x, first_y, last_y = tile_range(*BOUNDS, 12)
+	expected = (last_x - first_x + 1) * (last_y - first_y + 1)
+
+	assert cache.seed(*BOUNDS, [12], url=URL, fetch=fake_tile) == expected
+	assert cache.get(12, first_x, first_y) == f"https://tiles.invalid/12/{first_x}/{first_y}.png".encode()
+
+	# everything is cached now
+	assert cache.seed(*BOUNDS, [12], url=URL, fetch=fake_tile) == 0
+
+def test_seed_counts_only_stored_tiles(cache):
+	first_x, last_x, first_y, last_y = tile_range(*BOUNDS, 12)
+	expected = (last_x - first_x + 1) * (last_y - first_y + 1)
+	failing = URL.format(z=12, x=first_x, y=first_y)
+
+	def flaky_fetch(url):
+		if url == failing:
+			raise ConnectionError("offline")
+		return fake_tile(url)
+
+	assert cache.seed(*BOUNDS, [12], url=URL, fetch=flaky_fetch) == expected - 1
+	assert cache.get(12, first_x, first_y) is None
+
+	# the failed tile is retried next time
+	assert cache.seed(*BOUNDS, [12], url=URL, fetch=fake_tile) == 1
+
+def test_server_serves_cached_tiles(cache):
+	cache.put(12, 2288, 1326, b'png bytes')
+	server = TileServer(cache).start()
+	try:
+		url = server.url.replace('{Z}', '12').replace('{X}', '2288')
+
+		with urllib.request.urlopen(url.replace('{Y}', '1326')) as response:
+			assert response.read() == b'png bytes'
+			assert response.headers['Content-Type'] == 'image/png'
+
+		with pytest.raises(urllib.error.HTTPError) as error:
+			urllib.request.urlopen(url.replace('{Y}', '1327'))
+		assert error.value.code == 404
+	finally:
+		server.stop()
+
+def test_tile_handler_serves_cached_tiles(cache):
+	from tornado.httpserver import HTTPServer
+	from tornado.ioloop import IOLoop
+	from tornado.testing import bind_unused_port
+	from tornado.web import Application
+
+	cache.put(12, 2288, 1326, b'png bytes')
+	app = Application([(TILE_ROUTE, tile_handler(cache))])
+	sock, port = bind_unused_port()
+
+	async def fetch_tiles():
+		from tornado.httpclient import AsyncHTTPClient
+
+		server = HTTPServer(app)
+		server.add_sockets([sock])
+		client = AsyncHTTPClient()
+		try:
+			found = await client.fetch(f"http://127.0.0.1:{port}/tiles/12/2288/1326.png")
+			missing = await client.fetch(f"http://127.0.0.1:{port}/tiles/12/2288/1327.png", raise_error=False)
+			return found, missing
+		finally:
+			server.stop()
+
+	found, missing = IOLoop.current().run_sync(fetch_tiles)
+	assert found.body == b'png bytes'
+	assert found.headers['Content-Type'] == 'image/png'
+	assert missing.code == 404
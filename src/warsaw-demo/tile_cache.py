@@ -0,0 +1,225 @@
+"""Local map tile cache (MBTiles-style SQLite file) with a tiny HTTP endpoint serving it."""
+
+import math
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_web_mercator_extent = 20037508.342789244		# half of the world width in EPSG:3857 meters
+_servers = {}		# cache path -> running TileServer
+
+# tiles served by the app's own server, see tile_handler
+TILE_ROUTE = r'/tiles/(\d+)/(\d+)/(\d+)\.png'
+TILE_URL = '/tiles/{Z}/{X}/{Y}.png'		# relative, so tiles come from wherever the app itself is served from
+
+def tile_range(min_x, max_x, min_y, max_y, zoom):
+	"""Returns (min_x, max_x, min_y, max_y) XYZ tile indexes covering Web Mercator bounds at zoom."""
+
+	tiles = 2 ** zoom
+	tile_size = 2 * _web_mercator_extent / tiles
+
+	def to_tile(value):
+		return min(max(int((value + _web_mercator_extent) // tile_size), 0), tiles - 1)
+
+	# XYZ tiles count rows from the top
+	return to_tile(min_x), to_tile(max_x), tiles - 1 - to_tile(max_y), tiles - 1 - to_tile(min_y)
+
+def zoom_for_width(min_x, max_x, width):
+	"""Returns the zoom level at which bounds fill width pixels with 256px tiles."""
+
+	return max(0, math.ceil(math.log2(width * 2 * _web_mercator_extent / (256 * (max_x - min_x)))))
+
+def _tile_provider():
+	import xyzservices.providers as xyz
+
+	return xyz.CartoDB.PositronNoLabels
+
+def _download(url):
+	import requests
+
+	response = requests.get(url, headers={'User-Agent': 'warsaw-demo tile cache'}, timeout=30)
+	response.raise_for_status()
+
+	return response.content
+
+class TileCache:
+	"""
+	Tiles stored in a single SQLite file following the MBTiles layout.
+
+	MBTiles uses TMS row numbering (counted from the bottom), get() and put() take XYZ coordinates like tile URLs.
+	"""
+
+	def __init__(self, path='tiles.mbtiles'):
+		self.path = path
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, check_same_thread=False)
+		self._db.executescript("""
+			CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+			CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+			CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+		""")
+		self._db.executemany("INSERT OR IGNORE INTO metadata VALUES (?, ?)", [
+			('name', _tile_provider().name),
+			('format', 'png'),
+			('attribution', _tile_provider().html_attribution),
+		])
+		self._db.commit()
+
+	def get(self, z, x, y):
+		with self._lock:
+			row = self._db.execute(
+				"SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+				(z, x, 2 ** z - 1 - y)
+			).fetchone()
+
+		return row[0] if row else None
+
+	def put(self, z, x, y, data, commit=True):
+		with self._lock:
+			self._db.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (z, x, 2 ** z - 1 - y, data))
+			if commit:
+				self._db.commit()
+
+	def seed(self, min_x, max_x, min_y, max_y, zooms, url=None, fetch=_download):
+		"""
+		Downloads all missing tiles covering Web Mercator bounds at given zoom levels. Returns number of tiles stored.
+
+		fetch(url) returns tile bytes, it can be replaced with a local stand-in (e.g. when testing offline).
+		"""
+
+		url = url or _tile_provider().build_url()
+
+		missing = []
+		for z in zooms:
+			first_x, last_x, first_y, last_y = tile_range(min_x, max_x, min_y, max_y, z)
+			with self._lock:
+				existing = set(self._db.execute(
+					"SELECT tile_column, tile_row FROM tiles WHERE zoom_level = ?", (z,)
+				).fetchall())
+
+			for x in range(first_x, last_x + 1):
+				for y in range(first_y, last_y + 1):
+					if (x, 2 ** z - 1 - y) not in existing:
+						missing.append((z, x, y))
+
+		if missing:
+			print(f"Seeding {len(missing)} tiles into {self.path}")
+
+		stored = 0
+		for i, (z, x, y) in enumerate(missing):
+			try:
+				self.put(z, x, y, fetch(url.format(z=z, x=x, y=y, s='a', r='')), commit=False)
+				stored += 1
+			except Exception as e:
+				print(f"Error fetching tile {z}/{x}/{y} (caused by {e}), skipping")
+
+			# committing every tile is slow, but don't lose everything if seeding gets interrupted
+			if (i + 1) % 100 == 0:
+				with self._lock:
+					self._db.commit()
+				print(f"Seeded {i + 1}/{len(missing)} tiles")
+
+		with self._lock:
+			self._db.commit()
+
+		return stored
+
+class TileServer:
+	"""Serves tiles from a TileCache at http://127.0.0.1:<port>/{z}/{x}/{y}.png, in a background thread."""
+
+	def __init__(self, cache, port=0):
+		self.cache = cache
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(handler):
+				try:
+					z, x, y = (int(part) for part in handler.path.split('?')[0].removesuffix('.png').strip('/').split('/'))
+				except ValueError:
+					handler.send_error(400)
+					return
+
+				data = cache.get(z, x, y)
+				if data is None:
+					handler.send_error(404)
+					return
+
+				handler.send_response(200)
+				handler.send_header('Content-Type', 'image/png')
+				handler.send_header('Content-Length', str(len(data)))
+				handler.send_header('Cache-Control', 'max-age=86400')
+				handler.send_header('Access-Control-Allow-Origin', '*')
+				handler.end_headers()
+				handler.wfile.write(data)
+
+			def log_message(handler, *args):
+				pass		# quiet, every frame would spam the console
+
+		self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+		self._server.daemon_threads = True
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+	@property
+	def url(self):
+		return f"http://127.0.0.1:{self._server.server_port}/{{Z}}/{{X}}/{{Y}}.png"
+
+	def start(self):
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+def tile_handler(cache):
+	"""
+	Returns a tornado handler serving tiles from a TileCache, for the extra_patterns of a bokeh Server.
+
+	Route it at TILE_ROUTE and use TILE_URL as the tile URL, tiles then come from the same origin as the app.
+	"""
+	from tornado.web import HTTPError, RequestHandler
+
+	class TileHandler(RequestHandler):
+		def get(self, z, x, y):
+			data = cache.get(int(z), int(x), int(y))
+			if data is None:
+				raise HTTPError(404)
+
+			self.set_header('Content-Type', 'image/png')
+			self.set_header('Cache-Control', 'max-age=86400')
+			self.write(data)
+
+	return TileHandler
+
+def local_tile_url(min_x, max_x, min_y, max_y, zooms, path='tiles.mbtiles'):
+	"""
+	Seeds the cache for bounds (only missing tiles are downloaded) and returns URL of the local tile server.
+
+	The server listens on 127.0.0.1 only, which is fine for rendering on the same machine (frame_generator).
+	Apps opened in a browser should serve tiles themselves, see tile_handler.
+	"""
+
+	if path not in _servers:
+		_servers[path] = TileServer(TileCache(path)).start()
+
+	server = _servers[path]
+	server.cache.seed(min_x, max_x, min_y, max_y, zooms)
+
+	return server.url
+
+if __name__ == '__main__':
+	import argparse
+
+	from ztm_data.api import get_api_key, get_stop_data, get_routes_data
+	from visualization import create_graph, prepare_visualization_data
+
+	parser = argparse.ArgumentParser(description="Downloads map tiles covering the whole network into the local cache.")
+	parser.add_argument('--zooms', type=int, nargs=2, default=[10, 15], metavar=('MIN', 'MAX'), help="zoom levels (inclusive)")
+	parser.add_argument('--path', default='tiles.mbtiles')
+	args = parser.parse_args()
+
+	api_key = get_api_key()
+	G = create_graph(get_stop_data(api_key), get_routes_data(api_key))
+	_, _, _, min_x, max_x, min_y, max_y, _ = prepare_visualization_data(G)
+
+	stored = TileCache(args.path).seed(min_x, max_x, min_y, max_y, range(args.zooms[0], args.zooms[1] + 1))
+	print(f"Stored {stored} new tiles in {args.path}")
@@ -0,0 +1,266 @@
+"""Time-dependent routing on ZTM timetables (Connection Scan Algorithm)."""
+
+from array import array
+from bisect import bisect_left
+
+from ztm_data.api import get_timetable_data
+from visualization import create_stop_lookup, route_stop_ids
+
+# Used when a stop has no departures of its own (e.g. the last stop of a route)
+_DEFAULT_HOP_TIME = 60
+_NEVER = 2**31 - 1
+
+def parse_time(value: str) -> int:
+	"""Converts ZTM 'HH:MM:SS' time into seconds since midnight (ZTM uses hours past 24 for night trips)."""
+
+	hours, minutes, seconds = value.split(':')
+	return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+def format_time(seconds: int) -> str:
+	"""Converts seconds since midnight back into 'HH:MM:SS'."""
+
+	return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def load_timetable_data(api_key, stops_data, routes_data, lines=None, timetables=None):
+	"""
+	Fetches departure times for every stop of every route.
+
+	Result is grouped as timetables[line][direction][str(stop_id)] = sorted departures (in seconds),
+	so it can be saved with save_data_to_file and used later as a local fixture. Already loaded timetables
+	(e.g. a partially downloaded fixture) can be passed in, they're filled in place and only missing stops
+	are fetched.
+	"""
+
+	stop_lookup = create_stop_lookup(stops_data)
+
+	if timetables is None:
+		timetables = {}
+	for line, directions in routes_data['result'].items():
+		if lines is not None and line not in lines:
+			continue
+
+		for direction, route in directions.items():
+			route_timetable = timetables.setdefault(line, {}).setdefault(direction, {})
+
+			for stop_id in route_stop_ids(route, stop_lookup):
+				if str(stop_id) in route_timetable:
+					continue
+
+				data = get_timetable_data(api_key, stop_id, line)
+
+				departures = []
+				for departure in data['result']:
+					values = {item['key']: item['value'] for item in departure}
+					if values['trasa'] == direction:
+						departures.append(parse_time(values['czas']))
+
+				route_timetable[str(stop_id)] = sorted(departures)
+
+	return timetables
+
+class Timetable:
+	"""
+	Connections of the whole network, stored as flat arrays sorted by departure time.
+
+	ZTM timetables don't identify trips, so they are rebuilt by following every departure from the first
+	stop of a route and taking the earliest departure at each of the following stops.
+	"""
+
+	def __init__(self, stops_data, routes_data, timetables, transfer_time=120):
+		stop_lookup = create_stop_lookup(stops_data)
+
+		self.stops = []				# stop index -> stop id (as used in graphs)
+		self._stop_index = {}
+		self._stop_zespol = []		# stop index -> stop group ("zespół")
+		self.routes = []			# route index -> (line, direction)
+		self._trip_route = array('l')
+
+		connections = []
+		for line, directions in timetables.items():
+			for direction, route_timetable in directions.items():
+				route = routes_data['result'].get(line, {}).get(direction)
+				if route is None:
+					continue
+
+				route_stops = route_stop_ids(route, stop_lookup)
+				stop_ids = [str(stop_id) for stop_id in route_stops]
+				stop_indexes = [self._add_stop(stop_id) for stop_id in route_stops]
+				departures = [route_timetable.get(stop_id, []) for stop_id in stop_ids]
+
+				self.routes.append((line, direction))
+				route_idx = len(self.routes) - 1
+
+				for first_departure in (departures[0] if departures else []):
+					trip = len(self._trip_route)
+					self._trip_route.append(route_idx)
+
+					current = first_departure
+					hop_time = _DEFAULT_HOP_TIME
+					for i in range(1, len(stop_ids)):
+						if departures[i]:
+							j = bisect_left(departures[i], current)
+							if j == len(departures[i]):
+								break	# no more departures today
+							arrival = departures[i][j]
+						else:
+							arrival = current + hop_time
+
+						connections.append((current, arrival, stop_indexes[i - 1], stop_indexes[i], trip))
+						hop_time = max(arrival - current, 1)
+						current = arrival
+
+		connections.sort()
+
+		self._departure = array('l', (c[0] for c in connections))
+		self._arrival = array('l', (c[1] for c in connections))
+		self._departure_stop = array('l', (c[2] for c in connections))
+		self._arrival_stop = array('l', (c[3] for c in connections))
+		self._trip = array('l', (c[4] for c in connections))
+
+		# Walking transfers between posts ("słupki") of the same stop group ("zespół")
+		groups = {}
+		for idx, zespol in enumerate(self._stop_zespol):
+			groups.setdefault(zespol, []).append(idx)
+
+		self._transfers = [
+			[(other, transfer_time) for other in groups[zespol] if other != idx]
+			for idx, zespol in enumerate(self._stop_zespol)
+		]
+
+	def _add_stop(self, stop_id):
+		"""Returns index of a (zespol, slupek) stop, adding it if needed."""
+
+		node = str(stop_id)		# same as in create_graph
+		if node not in self._stop_index:
+			self._stop_index[node] = len(self.stops)
+			self.stops.append(node)
+			self._stop_zespol.append(stop_id[0])
+
+		return self._stop_index[node]
+
+	def __len__(self):
+		return len(self._departure)
+
+	def earliest_arrival(self, source, target, departure_time):
+		"""
+		Finds the earliest arrival at target when leaving source at departure_time (seconds since midnight).
+
+		Returns (arrival_time, legs), where each leg is a dict with line, direction, from, to, departure and arrival
+		(line and direction are None for walking transfers). Returns (None, []) when target can't be reached.
+		"""
+
+		if source not in self._stop_index or target not in self._stop_index:
+			return None, []
+
+		src = self._stop_index[source]
+		dst = self._stop_index[target]
+
+		earliest = {src: departure_time}
+		reached_by = {}		# stop -> (boarding connection, alighting connection) or (-1, previous stop) for transfers
+		boarded = {}		# trip -> boarding connection
+
+		for other, walk in self._transfers[src]:
+			earliest[other] = departure_time + walk
+			reached_by[other] = (-1, src)
+
+		departures = self._departure
+		arrivals = self._arrival
+		departure_stops = self._departure_stop
+		arrival_stops = self._arrival_stop
+		trips = self._trip
+		transfers = self._transfers
+
+		for c in range(bisect_left(departures, departure_time), len(departures)):
+			departure = departures[c]
+			if departure >= earliest.get(dst, _NEVER):
+				break
+
+			trip = trips[c]
+			if trip not in boarded:
+				if earliest.get(departure_stops[c], _NEVER) > departure:
+					continue
+				boarded[trip] = c
+
+			arrival = arrivals[c]
+			stop = arrival_stops[c]
+			if arrival < earliest.get(stop, _NEVER):
+				earliest[stop] = arrival
+				reached_by[stop] = (boarded[trip], c)
+
+				for other, walk in transfers[stop]:
+					if arrival + walk < earliest.get(other, _NEVER):
+						earliest[other] = arrival + walk
+						reached_by[other] = (-1, stop)
+
+		if dst not in reached_by:
+			return (departure_time, []) if src == dst else (None, [])
+
+		return earliest[dst], self._reconstruct_legs(reached_by, src, dst, earliest)
+
+	def _reconstruct_legs(self, reached_by, src, dst, earliest):
+		legs = []
+		stop = dst
+		while stop != src:
+			first, last = reached_by[stop]
+			if first == -1:
+				legs.append({
+					'line': None,
+					'direction': None,
+					'from': self.stops[last],
+					'to': self.stops[stop],
+					'departure': earliest[last],
+					'arrival': earliest[stop]
+				})
+				stop = last
+			else:
+				line, direction = self.routes[self._trip_route[self._trip[first]]]
+				legs.append({
+					'line': line,
+					'direction': direction,
+					'from': self.stops[self._departure_stop[first]],
+					'to': self.stops[stop],
+					'departure': self._departure[first],
+					'arrival': self._arrival[last]
+				})
+				stop = self._departure_stop[first]
+
+		legs.reverse()
+
+		return legs
+
+if __name__ == '__main__':
+	import time
+
+	from ztm_data.api import get_api_key, get_stop_data, get_routes_data, save_data_to_file, load_data_from_file
+
+	timetables_file = 'timetables.json'
+
+	api_key = get_api_key()
+
+	stops_data = get_stop_data(api_key)
+	routes_data = get_routes_data(api_key)
+
+	try:
+		timetables = load_data_from_file(timetables_file)
+	except FileNotFoundError:
+		timetables = {}
+
+	# only missing stops are fetched, progress is saved even when interrupted
+	try:
+		load_timetable_data(api_key, stops_data, routes_data, timetables=timetables)
+	finally:
+		save_data_to_file(timetables, timetables_file)
+
+	timetable = Timetable(stops_data, routes_data, timetables)
+	print(f"Loaded {len(timetable)} connections")
+
+	start = time.perf_counter()
+	arrival, legs = timetable.earliest_arrival("('1238', '01')", "('7006', '01')", parse_time("08:00:00"))
+	print(f"Query took {(time.perf_counter() - start) * 1000:.2f} ms")
+
+	if arrival is None:
+		print("No connection found")
+	else:
+		for leg in legs:
+			print(f"{format_time(leg['departure'])} -> {format_time(leg['arrival'])}: {leg['line'] or 'walk'} {leg['from']} -> {leg['to']}")
+		print(f"Arrival: {format_time(arrival)}")
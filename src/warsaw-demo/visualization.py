@@ -1,13 +1,8 @@
-import networkx as nx
-
-import pyproj
-
-import xyzservices.providers as xyz
-
-from bokeh.models import ColumnDataSource, CustomJS, WheelZoomTool, Legend, LegendItem, Div
-from bokeh.plotting import figure
-
 from ztm_data.stop import ZTMStop
+import instrumentation
+
+# networkx, numpy, pyproj, xyzservices and bokeh are imported inside functions that need them, they're slow to import
+# and e.g. routing on timetables or updating the graph shouldn't have to wait for a plotting library
 
 def create_stop_lookup(stops_data) -> dict[tuple[int, int], ZTMStop]:
 	"""Creates a dictionary to look up ZTMStop objects by their combined 'zespol' and 'slupek' IDs."""
@@ -23,53 +18,75 @@ def create_stop_lookup(stops_data) -> dict[tuple[int, int], ZTMStop]:
 
 	return stop_lookup
 
+def route_stop_ids(route, stop_lookup, warn=False) -> list[tuple[int, int]]:
+	"""Returns ids of the stops along a single route (in order), skipping the ones missing from stop_lookup."""
+
+	stop_ids = []
+	for _, stop_info in sorted(route.items(), key=lambda item: int(item[0])):
+		stop_id = (stop_info['nr_zespolu'], stop_info['nr_przystanku'])
+
+		if stop_id in stop_lookup:
+			stop_ids.append(stop_id)
+		elif warn:
+			print(f"Warning: Stop with id: {stop_id} not found in stop_lookup")
+
+	return stop_ids
+
+@instrumentation.timed('create_graph')
 def create_graph(stops_data, routes_data):
 	"""Creates a graph from stops and routes data."""
+	import networkx as nx
+
 	G = nx.Graph()
 	stop_lookup = create_stop_lookup(stops_data)
 
 	for line, directions in routes_data['result'].items():
 		for direction, route in directions.items():
-			ordered_stops = sorted(route.items(), key=lambda item: int(item[0]))
 			previous_stop_id = None
-			for _, stop_info in ordered_stops:
-				stop_id = (stop_info['nr_zespolu'], stop_info['nr_przystanku'])
-
-				if stop_id in stop_lookup:
-					stop = stop_lookup[stop_id]
-
-					G.add_node(
-						str(stop_id),	  # Convert to string for bokeh
-						pos=(stop.dlug_geo, stop.szer_geo),
-						label=f"{stop.nazwa_zespolu} {stop.slupek}"
+			for stop_id in route_stop_ids(route, stop_lookup, warn=True):
+				stop = stop_lookup[stop_id]
+
+				G.add_node(
+					str(stop_id),	  # Convert to string for bokeh
+					pos=(stop.dlug_geo, stop.szer_geo),
+					label=f"{stop.nazwa_zespolu} {stop.slupek}"
+				)
+
+				if previous_stop_id:
+					G.add_edge(
+						str(previous_stop_id),		  # Convert to string for bokeh
+						str(stop_id),				  # Convert to string for bokeh
+						line=line
 					)
-
-					if previous_stop_id:
-						G.add_edge(
-							str(previous_stop_id),		  # Convert to string for bokeh
-							str(stop_id),				  # Convert to string for bokeh
-							line=line
-						)
-					previous_stop_id = stop_id
-				else:
-					print(f"Warning: Stop with id: {stop_id} not found in stop_lookup")
+				previous_stop_id = stop_id
 
 	return G
 
-def prepare_visualization_data(G):
-	"""Prepares data for visualization: transforms coords, creates ColumnDataSources."""
+@instrumentation.timed('prepare_visualization_data')
+def prepare_visualization_data(G, mercator_positions=None):
+	"""
+	Prepares data for visualization: transforms coords, creates ColumnDataSources.
+
+	Already projected positions (e.g. from NetworkState) can be passed in to skip the transformation.
+	"""
+
+	import networkx as nx
+	from bokeh.models import ColumnDataSource
 
-	pos = nx.get_node_attributes(G, 'pos')
 	labels = nx.get_node_attributes(G, 'label')
-	edge_labels = nx.get_edge_attributes(G, 'line')
 
-	# Convert lat/lon to Web Mercator
-	transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True)
+	if mercator_positions is None:
+		import pyproj
+
+		pos = nx.get_node_attributes(G, 'pos')
 
-	mercator_positions = {
-		node: transformer.transform(pos[node][0], pos[node][1])
-		for node in pos
-	}
+		# Convert lat/lon to Web Mercator
+		transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True)
+
+		mercator_positions = {
+			node: transformer.transform(pos[node][0], pos[node][1])
+			for node in pos
+		}
 
 	# Calculate initial bounds in mercator coords
 	min_x = min(coord[0] for coord in mercator_positions.values())
@@ -94,25 +111,87 @@ def prepare_visualization_data(G):
 		color=["lightgrey"] * len(G.nodes())
 	))
 
-	# Prepare data for edges
-	edge_xs = []
-	edge_ys = []
-	for start, end in G.edges():
-		edge_xs.append([mercator_positions[start][0], mercator_positions[end][0]])
-		edge_ys.append([mercator_positions[start][1], mercator_positions[end][1]])
-
 	# Create a ColumnDataSource for edges
-	edge_data = ColumnDataSource(dict(
-		xs=edge_xs,
-		ys=edge_ys,
-		line=[edge_labels[edge] for edge in G.edges],
-		color=["gray"] * len(G.edges())
-	))
+	edge_data = ColumnDataSource(polyline_edge_data(G, mercator_positions))
 
 	return node_data, edge_data, mercator_positions, min_x, max_x, min_y, max_y, initial_ratio
 
-def create_bokeh_plot(min_x, max_x, min_y, max_y):
-	"""Creates a Bokeh plot with specified settings."""
+def line_polylines(G) -> list[tuple[str, list]]:
+	"""
+	Merges consecutive edges of the same line into polylines.
+
+	Returns (line, nodes along the polyline) pairs. Polylines are broken at nodes where the line branches or ends,
+	so every edge ends up in exactly one of them.
+	"""
+
+	edges_by_line = {}
+	for start, end, line in G.edges(data='line'):
+		edges_by_line.setdefault(line, []).append((start, end))
+
+	polylines = []
+	for line, edges in edges_by_line.items():
+		neighbors = {}
+		for start, end in edges:
+			neighbors.setdefault(start, []).append(end)
+			neighbors.setdefault(end, []).append(start)
+
+		used = set()
+
+		def walk(start, next_node):
+			nodes = [start]
+			previous, current = start, next_node
+			while True:
+				used.add(frozenset((previous, current)))
+				nodes.append(current)
+				if len(neighbors[current]) != 2:
+					return nodes
+
+				following = neighbors[current][0] if neighbors[current][1] == previous else neighbors[current][1]
+				if frozenset((current, following)) in used:
+					return nodes
+				previous, current = current, following
+
+		# start from the ends and branches first, then whatever is left are loops
+		ends = [node for node in neighbors if len(neighbors[node]) != 2]
+		for start in ends + list(neighbors):
+			for next_node in neighbors[start]:
+				if frozenset((start, next_node)) not in used:
+					polylines.append((line, walk(start, next_node)))
+
+	return polylines
+
+def line_codes(G) -> dict[str, int]:
+	"""
+	Numbers line names (in sorted order), this is the lookup table for the line column of edge data.
+
+	Edge data sends these small integers (as one binary array) instead of repeating the name for every polyline.
+	"""
+
+	return {line: code for code, line in enumerate(sorted({line for _, _, line in G.edges(data='line')}))}
+
+def polyline_edge_data(G, mercator_positions):
+	"""
+	Prepares edge data as one polyline per chain of edges of the same line (see line_polylines).
+
+	Shared vertices aren't repeated for every edge. Coordinates are plain lists: numpy views would be sent as
+	a separate binary buffer (with its own metadata) for every polyline, which ends up bigger than per-edge data.
+	"""
+
+	import numpy as np
+
+	polylines = line_polylines(G)
+	codes = line_codes(G)
+
+	return dict(
+		xs=[[mercator_positions[node][0] for node in nodes] for _, nodes in polylines],
+		ys=[[mercator_positions[node][1] for node in nodes] for _, nodes in polylines],
+		line=np.array([codes[line] for line, _ in polylines], dtype=np.int32),
+		color=["gray"] * len(polylines)
+	)
+
+def create_bokeh_plot(min_x, max_x, min_y, max_y, output_backend="canvas"):
+	"""Creates a Bokeh plot with specified settings. Use output_backend="webgl" for large networks."""
+	from bokeh.plotting import figure
 
 	plot = figure(
 		title="ZTM Warsaw Public Transport Network",
@@ -125,12 +204,28 @@ def create_bokeh_plot(min_x, max_x, min_y, max_y):
 		y_axis_type="mercator",
 		x_range=(min_x, max_x),
 		y_range=(min_y, max_y),
+		output_backend=output_backend,
 	)
 
 	return plot
 
-def create_tile_map(plot):
-	"""Adds a tile map to the Bokeh plot."""
+def create_tile_map(plot, tile_url=None, zooms=None):
+	"""
+	Adds a tile map to the Bokeh plot. Tiles can be served from a local cache by passing its tile_url.
+
+	zooms are the zoom levels available in the cache, the map doesn't ask for tiles outside of them.
+	"""
+	import xyzservices.providers as xyz
+	from bokeh.models import WMTSTileSource
+
+	if tile_url:
+		tile_source = WMTSTileSource(url=tile_url, attribution=xyz.CartoDB.PositronNoLabels.html_attribution)
+		if zooms:
+			tile_source.min_zoom = min(zooms)
+			tile_source.max_zoom = max(zooms)
+
+		plot.add_tile(tile_source)
+		return
 
 	# plot.add_tile(xyz.CartoDB.Positron)
 	plot.add_tile(xyz.CartoDB.PositronNoLabels)
@@ -161,6 +256,7 @@ def draw_nodes(plot, node_data):
 
 def create_zoom_callback(plot, initial_ratio):
 	"""Creates a zoom callback to maintain aspect ratio."""
+	from bokeh.models import CustomJS
 
 	callback = CustomJS(args=dict(plot=plot, initial_ratio=initial_ratio), code=
 		"""
@@ -190,6 +286,7 @@ def enable_wheel_zoom(plot):
 
 	In reality it just switches to the tool, but the goal is met.
 	"""
+	from bokeh.models import WheelZoomTool
 
 	plot.toolbar.active_scroll = plot.select_one(WheelZoomTool)
 
@@ -212,6 +309,7 @@ def reconstruct_path(came_from, start_stop_id, end_stop_id):
 
 def draw_path(plot, G, path, mercator_positions, color="red"):
 	"""Highlights a path on the Bokeh plot."""
+	from bokeh.models import ColumnDataSource
 
 	if not path:
 		return
@@ -230,6 +328,7 @@ def draw_path(plot, G, path, mercator_positions, color="red"):
 
 def create_legend(plot):
 	"""Creates a legend for the Bokeh plot."""
+	from bokeh.models import Legend, LegendItem
 
 	# Create legend
 	legend_items = [
@@ -243,6 +342,8 @@ def create_legend(plot):
 	return legend
 
 def create_description():
+	from bokeh.models import Div
+
 	div = Div(
 		text="""
 			<h1>Warsaw-demo</h1>
@@ -1,20 +1,16 @@
 import os
 import json
-import requests
 
 import atexit
 
-from dotenv import load_dotenv
-
-load_dotenv()  # Load variables from .env file
-
 _cache_file = 'api_cache.json'
-_cache = {}
+_cache = None		# loaded on first use, see _get_cache
 
 def _load_cache():
 	"""Loads the cache from a JSON file."""
 	global _cache
 
+	_cache = {}
 	if os.path.exists(_cache_file):
 		try:
 			with open(_cache_file, 'r') as f:
@@ -29,19 +25,31 @@ def _load_cache():
 def _save_cache():
 	"""Saves the cache to a JSON file."""
 
+	if _cache is None:
+		return		# cache was never used (or was cleared)
+
 	with open(_cache_file, 'w') as f:
 		json.dump(_cache, f, indent=4)
 
 	print("Cache saved to file.")
 
-# Load cache on module load
-_load_cache()
+def _get_cache():
+	"""Returns the cache, loading it from file on first use (and saving it back when the program exits)."""
 
-# Save cache when module is unloaded
-atexit.register(_save_cache)
+	if _cache is None:
+		_load_cache()
+
+		# Save cache when module is unloaded
+		atexit.unregister(_save_cache)
+		atexit.register(_save_cache)
+
+	return _cache
 
 def get_api_key():
 	"""Retrieves the API key from the .env file."""
+	from dotenv import load_dotenv
+
+	load_dotenv()  # Load variables from .env file
 	api_key = os.environ.get('API_KEY')
 
 	if not api_key:
@@ -50,36 +58,58 @@ def get_api_key():
 
 	return api_key
 
-def get_stop_data(api_key):
-	"""Fetches ZTM stop data from the API, using cache."""
+def get_stop_data(api_key, refresh=False):
+	"""Fetches ZTM stop data from the API, using cache (unless refresh is set)."""
 
 	cache_key = 'stops_data'
-	if cache_key in _cache:
+	cache = _get_cache()
+	if not refresh and cache_key in cache:
 		print("Using cached stops data")
-		return _cache[cache_key]
+		return cache[cache_key]
 
 	print("Fetching stops data from API")
+	import requests
+
 	response = requests.get(f'https://api.um.warszawa.pl/api/action/dbstore_get/?id=ab75c33d-3a26-4342-b36a-6e5fef0a3ac3&api_key={api_key}')
 	data = response.json()
-	_cache[cache_key] = data
+	cache[cache_key] = data
 
 	return data
 
-def get_routes_data(api_key):
-	"""Fetches ZTM routes data from the API, using cache."""
+def get_routes_data(api_key, refresh=False):
+	"""Fetches ZTM routes data from the API, using cache (unless refresh is set)."""
 
 	cache_key = 'routes_data'
-	if cache_key in _cache:
+	cache = _get_cache()
+	if not refresh and cache_key in cache:
 		print("Using cached routes data")
-		return _cache[cache_key]
+		return cache[cache_key]
 
 	print("Fetching routes data from API")
+	import requests
+
 	response = requests.get(f'https://api.um.warszawa.pl/api/action/public_transport_routes/?apikey={api_key}')
 	data = response.json()
-	_cache[cache_key] = data
+	cache[cache_key] = data
 
 	return data
 
+def get_timetable_data(api_key, stop_id, line):
+	"""
+	Fetches ZTM timetable for a single line at a single stop from the API.
+
+	Not cached: there are tens of thousands of these and raw responses would bloat the shared cache file that
+	every script loads. timetable.load_timetable_data keeps only the parsed departures instead.
+	"""
+
+	zespol, slupek = stop_id
+
+	print(f"Fetching timetable data for line {line} at stop {stop_id} from API")
+	import requests
+
+	response = requests.get(f'https://api.um.warszawa.pl/api/action/dbtimetable_get/?id=e923fa0e-d96c-43f9-ae6e-60518c9f3238&busstopId={zespol}&busstopNr={slupek}&line={line}&apikey={api_key}')
+	return response.json()
+
 def save_data_to_file(data, filename: str):
 	"""Saves data to a JSON file."""
 
@@ -96,7 +126,7 @@ def clear_cache():
 	"""Clears the cache."""
 
 	global _cache
-	_cache = {}
+	_cache = None
 
 	if os.path.exists(_cache_file):
 		os.remove(_cache_file)